@@ -0,0 +1,110 @@
+from array import array
+
+from lib.compat import IS_UPY
+
+if not IS_UPY:
+    from operator import mul
+
+_NOPREROLL = array('h')
+
+# s16 high byte -> 1 if negative, for counting sign changes a byte at a time
+_SIGN = bytes(1 if x&0x80 else 0 for x in range(256))
+
+def as_s16(arr, siz):
+    # contiguous s16 memoryview of the first siz samples, copies only when it has to
+    try:
+        mv = memoryview(arr)
+        if mv.format == 'h' and mv.c_contiguous:
+            return mv[:siz]
+    except (TypeError, AttributeError):
+        pass
+    return memoryview(array('h', arr[:siz]))
+
+if IS_UPY:
+    def window_stats(w):
+        # (mean square, zero crossings)
+        e = 0
+        z = 0
+        last = 0
+        for v in w:
+            e += v*v
+            z += (v < 0) != (last < 0)
+            last = v
+        return e//len(w), z
+else:
+    def window_stats(w):
+        # (mean square, zero crossings), no python level loop over the samples.
+        # The sign bytes are packed into one big int, xor'ed with itself shifted
+        # a sample, leaving a 1 at every sign change
+        e = sum(map(mul, w, w))
+        s = int.from_bytes(bytes(w.cast('B')[1::2]).translate(_SIGN), 'little')
+        return e//len(w), bin(s ^ (s>>8)).count('1')
+
+class ActivityGate():
+    # Block level carrier detect in front of the filter chain.  A block is
+    # active when any window in it has the energy and the zero crossing rate of
+    # afsk, level to turn on, level/2 to stay on, and stays active for hang
+    # samples after the last such window.  Idle audio skips the dsp.  The tail
+    # of the idle audio is kept and run through the filters first when the
+    # channel turns active, at least the memory of the filter chain, so their
+    # state is the same as if they never stopped and the preamble is not lost
+    def __init__(self, sampling_rate,
+                       level   = 200,  # rms (raw samples) to turn on
+                       zc_max  = 3500, # Hz, a crossing rate above is broadband noise, not afsk
+                       window  = 20,   # ms
+                       hang    = 100,  # ms, plus the filter memory
+                       preroll = 100,  # ms, plus the filter memory
+                       memory  = 0,    # samples, filter chain memory
+                       ):
+        fs = sampling_rate
+        self.on = level*level
+        self.off = self.on//4
+        self.win = max(1, fs*window//1000)
+        # crossings per window, 2 per cycle, never above the white noise rate
+        self.zc_max = min(2*zc_max, fs*2//5)*self.win//fs
+        self.hang = fs*hang//1000 + memory
+        self.npreroll = fs*preroll//1000 + memory
+        self.active = False
+        self.quiet = self.hang # samples since the last active window
+        self.preroll = array('h')
+        self.nidle = 0         # stats, samples skipped
+
+    def check(self, arr, siz):
+        # returns (pre-roll, n), run the pre-roll then the first n samples of
+        # the block through the filters, n is 0 for an idle block
+        mv = as_s16(arr, siz)
+        win = self.win
+        lvl = self.off if self.active else self.on
+        zc_max = self.zc_max
+        last = -1
+        for i in range(0, siz, win):
+            w = mv[i:i+win]
+            if len(w) < 8:
+                break
+            e, z = window_stats(w)
+            if e >= lvl and z*win <= zc_max*len(w):
+                last = i+len(w)
+        if last >= 0:
+            n = siz
+            self.quiet = siz-last
+        else:
+            # the hang runs out in this block, or already has
+            n = max(0, min(siz, self.hang-self.quiet))
+            self.quiet += siz
+        was = self.active
+        self.active = self.quiet < self.hang
+        pre = _NOPREROLL
+        if n and not was:
+            pre = self.preroll
+            self.preroll = array('h')
+        if n < siz:
+            # keep the unprocessed tail for the pre-roll
+            self.nidle += siz-n
+            keep = self.npreroll
+            if n or siz-n >= keep:
+                self.preroll = array('h', mv[max(n, siz-keep):])
+            else:
+                self.preroll.extend(mv)
+                if len(self.preroll) > keep:
+                    self.preroll = self.preroll[len(self.preroll)-keep:]
+        return pre, n
@@ -0,0 +1,159 @@
+from array import array
+from collections import OrderedDict
+
+from ax25.ax25 import AX25
+from afsk.decoder import BlockDecoder
+from afsk.fir_options import fir_presets
+
+from lib.compat import IS_UPY
+
+if not IS_UPY:
+    from multiprocessing import Pipe
+    from multiprocessing import Process
+
+def _bank_worker(conn, sampling_rate, options, soft):
+    # worker process, one decoder per configuration
+    # in: (typecode, sample bytes) or None to flush and exit
+    # out: [(t, frame bytes)]
+    decoder = BlockDecoder(sampling_rate = sampling_rate,
+                           options       = options,
+                           soft          = soft)
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            frames = decoder.flush()
+        else:
+            arr = array(msg[0])
+            arr.frombytes(msg[1])
+            frames = decoder.decode(arr, len(arr))
+        conn.send([(t, bytes(ax25.to_frame())) for t,ax25 in frames])
+        if msg is None:
+            break
+    conn.close()
+
+class FrameDedup():
+    # Time windowed de-duplication by frame bytes.  A frame seen again within
+    # window samples of its first sighting is a duplicate, its config is added
+    # to the first sighting's contributors.  Frames come in time order, so the
+    # oldest sighting is always first in seen and expiring stops at the first
+    # one still in the window
+    def __init__(self, window):
+        self.window = window
+        self.seen = OrderedDict() # frame bytes -> (t, frame, contributors), oldest first
+        self.on_expire = None
+
+    def add(self, t, frame, idx):
+        # returns the contributors list if this is a new frame, else None
+        self.expire(t)
+        key = bytes(frame)
+        hit = self.seen.get(key)
+        if hit:
+            if idx not in hit[2]:
+                hit[2].append(idx)
+            return None
+        contributors = [idx]
+        self.seen[key] = (t, frame, contributors)
+        return contributors
+
+    def expire(self, t = None):
+        # drop frames older than the window, all of them if t is None
+        seen = self.seen
+        while seen:
+            key = next(iter(seen))
+            if t is not None and t-seen[key][0] <= self.window:
+                break
+            hit = seen.pop(key)
+            if self.on_expire:
+                self.on_expire(hit)
+
+class DecoderBank():
+    # Run several demodulator configurations over the same samples and merge their
+    # frames, the union of what each tuning decodes.  Each config runs in its own
+    # worker process (in-process on micropython or with processes = False).
+    # decode() returns (t, ax25, contributors) for every new frame, t the sample
+    # count, contributors the config indexes that decoded it, the first one first.
+    # Configs that decode a duplicate later within the window are appended to the
+    # same list.  counters[idx] has per config 'frames' and 'unique' (nobody else
+    # decoded it, known once the frame leaves the window)
+    def __init__(self, sampling_rate = 22050,
+                       configs       = ('default', 'germany', 'rtl_fm', 'tnc_test'), # preset names or options dicts
+                       window_s      = 2.0,   # dedup window
+                       soft          = False,
+                       processes     = True,
+                       ):
+        self.configs = [fir_presets[c] if isinstance(c, str) else c for c in configs]
+        self.names = [c if isinstance(c, str) else 'config{}'.format(i) for i,c in enumerate(configs)]
+        self.dedup = FrameDedup(window = int(window_s*sampling_rate))
+        self.dedup.on_expire = self.on_expire
+        self.counters = [{'frames' : 0, 'unique' : 0} for _ in self.configs]
+        self.procs = []
+        self.conns = []
+        self.decoders = []
+        if processes and not IS_UPY:
+            for options in self.configs:
+                parent, child = Pipe()
+                proc = Process(target = _bank_worker,
+                               args   = (child, sampling_rate, options, soft),
+                               daemon = True)
+                proc.start()
+                child.close()
+                self.procs.append(proc)
+                self.conns.append(parent)
+        else:
+            self.decoders = [BlockDecoder(sampling_rate = sampling_rate,
+                                          options       = options,
+                                          soft          = soft) for options in self.configs]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def on_expire(self, hit):
+        if len(hit[2]) == 1:
+            self.counters[hit[2][0]]['unique'] += 1
+
+    def decode(self, arr, siz):
+        if self.conns:
+            msg = (arr.typecode, arr[:siz].tobytes()) if siz < len(arr) else (arr.typecode, arr.tobytes())
+            for conn in self.conns:
+                conn.send(msg)
+            results = [conn.recv() for conn in self.conns]
+        else:
+            results = [[(t, bytes(ax25.to_frame())) for t,ax25 in d.decode(arr, siz)] for d in self.decoders]
+        return self.merge(results)
+
+    def flush(self):
+        # flush every decoder, stop the workers, expire the dedup window
+        if self.conns:
+            for conn in self.conns:
+                conn.send(None)
+            results = [conn.recv() for conn in self.conns]
+        else:
+            results = [[(t, bytes(ax25.to_frame())) for t,ax25 in d.flush()] for d in self.decoders]
+        out = self.merge(results)
+        self.dedup.expire()
+        self.close()
+        return out
+
+    def merge(self, results):
+        # time order, lowest config index first on ties
+        frames = sorted((t, idx, frame) for idx,res in enumerate(results) for t,frame in res)
+        out = []
+        for t,idx,frame in frames:
+            self.counters[idx]['frames'] += 1
+            contributors = self.dedup.add(t, frame, idx)
+            if contributors:
+                out.append((t, AX25(frame = frame), contributors))
+        return out
+
+    def close(self):
+        for conn in self.conns:
+            conn.close()
+        for proc in self.procs:
+            proc.join(timeout = 1)
+            if proc.is_alive():
+                proc.terminate()
+        self.conns = []
+        self.procs = []
@@ -0,0 +1,85 @@
+from array import array
+
+from afsk.demod import AFSKDemodulator
+from ax25.hdlc import HDLCDeframer
+from ax25.hdlc import SoftHDLCDeframer
+from ax25.from_afsk import AX25FromAFSK
+
+from lib.metrics import clock
+
+class BlockDecoder():
+    # Demodulate, deframe and decode blocks of samples, no event loop needed.
+    # Frames come back as (t, ax25), t the input sample count at the end of the
+    # block the frame completed in
+    def __init__(self, sampling_rate = 22050,
+                       options       = {},
+                       soft          = False, # confidence ordered repair, see SoftFixer
+                       fixer         = None,
+                       soft_fixer    = None,
+                       metrics       = None, # lib.metrics.Metrics
+                       ):
+        self.soft = soft
+        self.metrics = metrics
+        self.demod = AFSKDemodulator(in_rx         = None,
+                                     bits_out_q    = None,
+                                     sampling_rate = sampling_rate,
+                                     options       = options,
+                                     soft          = soft,
+                                     metrics       = metrics)
+        self.deframer = SoftHDLCDeframer() if soft else HDLCDeframer()
+        self.from_afsk = AX25FromAFSK(None, None,
+                                      fixer      = fixer,
+                                      soft       = soft,
+                                      soft_fixer = soft_fixer,
+                                      metrics    = metrics)
+        self.nsamples = 0
+
+    def decode(self, arr, siz):
+        self.nsamples += siz
+        metrics = self.metrics
+        if self.soft:
+            bits, confs = self.demod.process_block_soft(arr, siz)
+            if metrics:
+                t = clock()
+            frames = self.deframer.feed(bits, confs)
+        else:
+            bits = self.demod.process_block(arr, siz)
+            if metrics:
+                t = clock()
+            frames = [(frame,fcs,None) for frame,fcs in self.deframer.feed(bits)]
+        if metrics:
+            metrics.time('deframe', t)
+        out = []
+        decode_frame = self.from_afsk.decode_frame
+        for frame,fcs,span in frames:
+            ax25 = decode_frame(memoryview(frame) if frame else None, fcs, span)
+            if ax25:
+                out.append((self.nsamples, ax25))
+        return out
+
+    def flush(self):
+        # push silence through the filters so the last bits come out
+        z = array('h', bytes(2*self.demod.flush_size))
+        return self.decode(z, len(z))
+
+def decode_samples(samples, sampling_rate = 22050,
+                            options       = {},
+                            soft          = False,
+                            block         = 4096,
+                            ):
+    # Decode a whole recording in one call, no event loop.  samples is anything
+    # indexable of s16 (array, memoryview) or a bytes like s16 little endian
+    # buffer.  returns [AX25] in the order received
+    if isinstance(samples, (bytes, bytearray)):
+        samples = memoryview(samples)[:len(samples)&~1].cast('h')
+    decoder = BlockDecoder(sampling_rate = sampling_rate,
+                           options       = options,
+                           soft          = soft)
+    frames = []
+    decode = decoder.decode
+    n = len(samples)
+    for i in range(0, n, block):
+        arr = samples[i:i+block]
+        frames += decode(arr, len(arr))
+    frames += decoder.flush()
+    return [ax25 for t,ax25 in frames]
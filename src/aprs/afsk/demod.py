@@ -1,30 +1,35 @@
 
 import sys
 import struct
-import asyncio
 from array import array
 import math
 import lib.upydash as _
-from asyncio import Event
 
 from lib.utils import eprint
-from lib.memoize import memoize_loads
-from lib.memoize import memoize_dumps
-from lib.compat import Queue
+from lib.coefcache import coef_loads
+from lib.coefcache import coef_dumps
 from lib.compat import IS_UPY
 
 from afsk.func import create_unnrzi
 from afsk.func import create_corr
+from afsk.func import create_quad_disc
+from afsk.func import create_goertzel_disc
+from afsk.func import fir_gain
 from afsk.func import lpf_fir_design
 from afsk.func import bandpass_fir_design
 from afsk.func import create_sampler
+from afsk.func import create_soft_sampler
+from afsk.func import create_pll_sampler
 from afsk.func import create_fir
 from afsk.func import create_power_meter
 from afsk.func import clamps16
 from afsk.fir_options import fir_options
 from afsk.func import bu16toi, bs16toi
+from afsk.activity import ActivityGate
+from afsk.source import U16_TO_S16
 
 from lib.compat import print_exc
+from lib.metrics import clock
 
 _FMARK  = 1200
 _FSPACE = 2200
@@ -40,16 +45,24 @@ class AFSKDemodulator():
                        stream_type   = 's16', # if in_rx is a stream, u16 or s16?
                        is_embedded   = False,
                        options       = {},
+                       packed        = True,  # output packed line bits (bytes) for HDLCDeframer, else single un-nrzi'd bits
+                       soft          = False, # packed output is (bytes, array('H') confidence per bit) for SoftHDLCDeframer
+                       taps          = None,  # {stage : sink} record intermediate samples, see afsk/taps.py
+                       metrics       = None,  # lib.metrics.Metrics, per stage cpu time and sample counts
                        ):
-                       # debug_samples = False, # output intermediate samples to stderr
 
         self.in_rx  = in_rx
         self.bits_q = bits_out_q
         self.verbose = verbose
         self.stream_type = stream_type
         self.is_embedded = is_embedded
-        # self.debug_samples = debug_samples
-        self.stream_done = Event()
+        self.packed = packed or soft
+        self.soft = soft
+        self.taps = taps or {}
+        self.tapbufs = {}
+        self.metrics = metrics
+        self.meterbuf = array('i')
+        self.stream_done = None # asyncio.Event, the event loop parts import asyncio when used
 
         self.fs = sampling_rate
         self.ts = 1/self.fs
@@ -63,11 +76,11 @@ class AFSKDemodulator():
         bandpass_width = options['bandpass_width']
         bandpass_amark = options['bandpass_amark']
         bandpass_aspace = options['bandpass_aspace']
-        coefs_g = memoize_loads('bpf', _FMARK, _FSPACE, self.fs, 
-                                       bandpass_ncoefs,
-                                       bandpass_width, 
-                                       bandpass_amark, 
-                                       bandpass_aspace)
+        coefs_g = coef_loads('bpf', _FMARK, _FSPACE, self.fs, 
+                                    bandpass_ncoefs,
+                                    bandpass_width, 
+                                    bandpass_amark, 
+                                    bandpass_aspace)
         if coefs_g:
             coefs,g = coefs_g
         else: 
@@ -79,14 +92,14 @@ class AFSKDemodulator():
                                           amark  = bandpass_amark,
                                           aspace = bandpass_aspace,
                                           )
-            memoize_dumps('bpf', (coefs,g), _FMARK, _FSPACE, self.fs,
-                                        bandpass_ncoefs,
-                                        bandpass_width, 
-                                        bandpass_amark, 
-                                        bandpass_aspace)
+            coef_dumps('bpf', (coefs,g), _FMARK, _FSPACE, self.fs,
+                                     bandpass_ncoefs,
+                                     bandpass_width, 
+                                     bandpass_amark, 
+                                     bandpass_aspace)
         self.bpf = create_fir(coefs = coefs, scale = g)
+        bpf_coefs,bpf_g = coefs,g
 
-        self.corr = create_corr(ts    = self.ts,)
 
         # nmark = int(_TMARK/self.ts)
         lpf_ncoefsbaud = options['lpf_ncoefsbaud']
@@ -95,10 +108,10 @@ class AFSKDemodulator():
         lpf_aboost = options['lpf_aboost']
         lpf_f = options['lpf_f']
         if do_memoize:
-            coefs_g = memoize_loads('lpf', lpf_f, self.fs, 
-                                           lpf_ncoefs, 
-                                           lpf_width, 
-                                           lpf_aboost)
+            coefs_g = coef_loads('lpf', lpf_f, self.fs, 
+                                        lpf_ncoefs, 
+                                        lpf_width, 
+                                        lpf_aboost)
         else:
             coefs_g = None
         if coefs_g:
@@ -111,25 +124,70 @@ class AFSKDemodulator():
                                      aboost = lpf_aboost,
                                      )
             if do_memoize:
-                memoize_dumps('lpf', (coefs,g), lpf_f, self.fs,
-                                            lpf_ncoefs, 
-                                            lpf_width, 
-                                            lpf_aboost)
+                coef_dumps('lpf', (coefs,g), lpf_f, self.fs,
+                                         lpf_ncoefs, 
+                                         lpf_width, 
+                                         lpf_aboost)
         self.lpf = create_fir(coefs = coefs, scale = g)
 
-        self.sampler = create_sampler(fbaud = _FBAUD,
-                                      fs    = self.fs)
+        # discriminator, the quadrature mixer and goertzel do their own smoothing
+        # and need no lpf
+        discriminator = options['discriminator']
+        if discriminator in ('quad', 'goertzel'):
+            # they compare tone energies, take out half the bandpass mark/space
+            # tilt (in dB), all of it weighs the mark tone too much in noise
+            hm = fir_gain(bpf_coefs, bpf_g, _FMARK, self.fs)
+            hs = fir_gain(bpf_coefs, bpf_g, _FSPACE, self.fs)
+            wm = round(256*math.sqrt(max(hm,hs)/hm))
+            ws = round(256*math.sqrt(max(hm,hs)/hs))
+            create_disc = create_quad_disc if discriminator == 'quad' else create_goertzel_disc
+            self.corr = create_disc(fmark  = _FMARK,
+                                    fspace = _FSPACE,
+                                    fs     = self.fs,
+                                    n      = round(1.25*self.fs/_FBAUD),
+                                    k      = round(self.fs/_FBAUD*0.45)|1,
+                                    wm     = wm,
+                                    ws     = ws)
+            self.lpf = None
+        else:
+            self.corr = create_corr(ts    = self.ts,)
+
+        if options['sampler'] == 'pll':
+            self.sampler = create_pll_sampler(fbaud = _FBAUD,
+                                              fs    = self.fs)
+            self.soft_sampler = create_pll_sampler(fbaud = _FBAUD,
+                                                   fs    = self.fs,
+                                                   soft  = True)
+        else:
+            self.sampler = create_sampler(fbaud = _FBAUD,
+                                          fs    = self.fs)
+            self.soft_sampler = create_soft_sampler(fbaud = _FBAUD,
+                                                    fs    = self.fs)
         self.unnrzi = create_unnrzi()
 
+        # packed output, line bits msb first
+        self.acc  = 0
+        self.nacc = 0
+        self.confs = array('H') # soft, confidences of the bits in acc
+
         self.pwrmtr = create_power_meter(siz = 20)#nmark*2)
         self.squelch = options['squelch']
 
         #how much we need to flush internal filters to process all sampled data
         self.flush_size = int((lpf_ncoefs+bandpass_ncoefs)*(_TBAUD/self.ts))
 
+        # block level carrier detect, idle blocks skip the filters entirely
+        self.gate = None
+        if options['activity']:
+            self.gate = ActivityGate(sampling_rate = self.fs,
+                                     level         = options['activity_level'],
+                                     memory        = lpf_ncoefs+bandpass_ncoefs+20+nmark)
+
         self.tasks = []
 
     async def __aenter__(self):
+        import asyncio
+        from lib.compat import Queue
         if not self.in_rx:
             return self
         if isinstance(self.in_rx, Queue):
@@ -141,17 +199,27 @@ class AFSKDemodulator():
         return self
 
     async def __aexit__(self, *args):
+        import asyncio
         # _.for_each(self.tasks, lambda t: t.cancel())
         map(lambda t: t.cancel(), self.tasks)
         await asyncio.gather(*self.tasks, return_exceptions=True)
 
     async def join(self):
+        from lib.compat import Queue
         if not self.in_rx:
             return
         if isinstance(self.in_rx, Queue):
             await self.in_rx.join()
         else:
-            await self.stream_done.wait()
+            await self.done_event().wait()
+
+    def done_event(self):
+        # set when stream_core is done, made on first use so asyncio is only
+        # imported by the event loop parts
+        if self.stream_done is None:
+            from asyncio import Event
+            self.stream_done = Event()
+        return self.stream_done
 
     # directly access from a stream with readexactly method
     # @micropython.native
@@ -169,7 +237,7 @@ class AFSKDemodulator():
 
             bits_q = self.bits_q   # output stream
 
-            asleep = asyncio.sleep
+            from asyncio import sleep as asleep
 
             is_sync = False
             readinto = None
@@ -200,6 +268,17 @@ class AFSKDemodulator():
                 raise Exception('unknown stream {}'.format(in_rx))
 
             sql = self.squelch
+            packed = self.packed
+            soft = self.soft
+            if (self.gate or self.taps) and packed and not IS_UPY and hasattr(in_rx, 'read'):
+                # whole blocks, so idle ones can skip the filters and taps are block-wise
+                await self.stream_block_core(in_rx, is_sync)
+                return
+            if soft:
+                sampler = self.soft_sampler
+            acc = 0
+            nacc = 0
+            confs = array('H')
 
             # bytes to integer converter
             btoi = bs16toi if self.stream_type=='s16' else bu16toi
@@ -237,19 +316,302 @@ class AFSKDemodulator():
                     continue
                 # eprint(o)
                 o = corr(o)
-                o = lpf(o)
+                if lpf:
+                    o = lpf(o)
                 bs = sampler(o)
+                if soft:
+                    if bs >= 0:
+                        acc = (acc<<1)|(bs&0x01)
+                        confs.append(min(bs>>1, 0xffff))
+                        nacc += 1
+                        if nacc == 8:
+                            await bits_q.put((bytes((acc,)), confs)) #bits_out_q
+                            acc = 0
+                            nacc = 0
+                            confs = array('H')
+                    continue
                 if bs != 2: # _NONE
+                    if packed:
+                        acc = (acc<<1)|bs
+                        nacc += 1
+                        if nacc == 8:
+                            await bits_q.put(bytes((acc,))) #bits_out_q
+                            acc = 0
+                            nacc = 0
+                        continue
                     bx = unnrzi(bs)
                     # eprint(b,end='')
                     await bits_q.put(bx) #bits_out_q
         except Exception as err:
             print_exc(err)
         finally:
-            self.stream_done.set()
+            self.done_event().set()
             # print('STREAM DONE')
 
 
+    # stream_core for packed output with the activity gate, reads blocks
+    async def stream_block_core(self, in_rx, is_sync, block = 2048):
+        read = in_rx.read
+        bits_q = self.bits_q
+        soft = self.soft
+        process = self.process_block_soft if soft else self.process_block
+        u16 = self.stream_type == 'u16'
+        pending = b''
+        while True:
+            b = read(2*block) if is_sync else await read(2*block)
+            if not b:
+                break
+            if pending:
+                b = pending + b
+            n = len(b) & ~1 # whole samples
+            pending = b[n:]
+            buf = bytearray(b[:n])
+            if u16:
+                buf[1::2] = buf[1::2].translate(U16_TO_S16)
+            arr = memoryview(buf).cast('h')
+            out = process(arr, len(arr))
+            arr.release()
+            if soft:
+                if out[0]:
+                    await bits_q.put(out)
+            elif out:
+                await bits_q.put(out)
+
+    def _select(self, tapped, metered, plain):
+        # the block loop for the taps or metrics in use, not both: the tapped
+        # loops do not time the stages and the metered ones do not fill taps
+        if self.taps and self.metrics:
+            raise Exception('stage taps and metrics can not be used together')
+        return tapped if self.taps else metered if self.metrics else plain
+
+    # process a block of samples, returns the packed (msb first) line bits
+    # no awaits in here, usable without an event loop
+    def process_block(self, arr, siz):
+        process = self._select(self._process_block_tapped, self._process_block_metered, self._process_block)
+        if self.metrics:
+            self.metrics.inc('demod_audio_seconds_total', siz/self.fs)
+        gate = self.gate
+        if gate:
+            pre, siz = gate.check(arr, siz)
+            if pre:
+                return process(pre, len(pre)) + process(arr, siz)
+        return process(arr, siz)
+
+    def _process_block(self, arr, siz):
+        corr     = self.corr
+        lpf      = self.lpf
+        bpf      = self.bpf
+        sampler  = self.sampler
+        pwrmtr   = self.pwrmtr
+        sql      = self.squelch
+        acc      = self.acc
+        nacc     = self.nacc
+        out      = bytearray()
+        for i in range(siz):
+            o = bpf(arr[i])
+            p = pwrmtr(o)
+            if p < sql:
+                continue
+            o = corr(o)
+            if lpf:
+                o = lpf(o)
+            bs = sampler(o)
+            if bs != 2: # _NONE
+                acc = (acc<<1)|bs
+                nacc += 1
+                if nacc == 8:
+                    out.append(acc)
+                    acc = 0
+                    nacc = 0
+        self.acc  = acc
+        self.nacc = nacc
+        return out
+
+    # process_block, but also returns the confidence of each line bit
+    # returns (packed, array('H')), 8 confidences per packed byte
+    def process_block_soft(self, arr, siz):
+        process = self._select(self._process_block_soft_tapped, self._process_block_soft_metered, self._process_block_soft)
+        if self.metrics:
+            self.metrics.inc('demod_audio_seconds_total', siz/self.fs)
+        gate = self.gate
+        if gate:
+            pre, siz = gate.check(arr, siz)
+            if pre:
+                out, confs = process(pre, len(pre))
+                out2, confs2 = process(arr, siz)
+                return out+out2, confs+confs2
+        return process(arr, siz)
+
+    def _process_block_soft(self, arr, siz):
+        corr     = self.corr
+        lpf      = self.lpf
+        bpf      = self.bpf
+        sampler  = self.soft_sampler
+        pwrmtr   = self.pwrmtr
+        sql      = self.squelch
+        acc      = self.acc
+        nacc     = self.nacc
+        out      = bytearray()
+        confs    = self.confs
+        self.confs = array('H')
+        for i in range(siz):
+            o = bpf(arr[i])
+            p = pwrmtr(o)
+            if p < sql:
+                continue
+            o = corr(o)
+            if lpf:
+                o = lpf(o)
+            bs = sampler(o)
+            if bs >= 0:
+                acc = (acc<<1)|(bs&0x01)
+                confs.append(min(bs>>1, 0xffff))
+                nacc += 1
+                if nacc == 8:
+                    out.append(acc)
+                    acc = 0
+                    nacc = 0
+        # hold back the confidences of the bits still in acc
+        if nacc:
+            self.confs = confs[len(confs)-nacc:]
+            del confs[len(confs)-nacc:]
+        self.acc  = acc
+        self.nacc = nacc
+        return out, confs
+
+    # the block loops with taps, kept apart so the untapped loops pay nothing
+    def _process_block_tapped(self, arr, siz):
+        return self._tapped(arr, siz, False)
+
+    def _process_block_soft_tapped(self, arr, siz):
+        return self._tapped(arr, siz, True)
+
+    def _tapped(self, arr, siz, soft):
+        corr     = self.corr
+        lpf      = self.lpf
+        bpf      = self.bpf
+        sampler  = self.soft_sampler if soft else self.sampler
+        pwrmtr   = self.pwrmtr
+        sql      = self.squelch
+        bss      = []
+        # preallocated stage buffers, untapped stages go to a scratch buffer
+        bufs = self.tapbufs
+        for stage in ('in', 'bpf', 'pwr', 'cor', 'lpf', None):
+            if stage not in bufs or len(bufs[stage]) < siz:
+                bufs[stage] = array('i', bytes(4*siz))
+        taps = self.taps
+        scratch = bufs[None]
+        tin  = bufs['in']  if 'in'  in taps else scratch
+        tbpf = bufs['bpf'] if 'bpf' in taps else scratch
+        tpwr = bufs['pwr'] if 'pwr' in taps else scratch
+        tcor = bufs['cor'] if 'cor' in taps else scratch
+        tlpf = bufs['lpf'] if 'lpf' in taps else scratch
+        for i in range(siz):
+            o = arr[i]
+            tin[i] = o
+            o = bpf(o)
+            tbpf[i] = o
+            p = pwrmtr(o)
+            tpwr[i] = p
+            if p < sql:
+                tcor[i] = 0
+                tlpf[i] = 0
+                continue
+            o = corr(o)
+            tcor[i] = o
+            if lpf:
+                o = lpf(o)
+            tlpf[i] = o
+            bss.append(sampler(o))
+        for stage,sink in taps.items():
+            sink.write(bufs[stage], siz)
+        return self._pack(bss, soft)
+
+    # the block loops with metrics, a stage at a time over the whole block so
+    # each stage is timed once per block, not per sample.  The stages only see
+    # their own input in order, the bits are the same as the interleaved loops
+    def _process_block_metered(self, arr, siz):
+        return self._metered(arr, siz, False)
+
+    def _process_block_soft_metered(self, arr, siz):
+        return self._metered(arr, siz, True)
+
+    def _metered(self, arr, siz, soft):
+        corr     = self.corr
+        lpf      = self.lpf
+        bpf      = self.bpf
+        sampler  = self.soft_sampler if soft else self.sampler
+        pwrmtr   = self.pwrmtr
+        sql      = self.squelch
+        m        = self.metrics
+        buf      = self.meterbuf
+        if len(buf) < siz:
+            buf = self.meterbuf = array('i', bytes(4*siz))
+        t = clock()
+        for i in range(siz):
+            buf[i] = bpf(arr[i])
+        m.time('bpf', t)
+        t = clock()
+        k = 0
+        for i in range(siz):
+            o = buf[i]
+            if pwrmtr(o) >= sql:
+                buf[k] = o
+                k += 1
+        m.time('pwr', t)
+        t = clock()
+        for i in range(k):
+            buf[i] = corr(buf[i])
+        m.time('disc', t)
+        if lpf:
+            t = clock()
+            for i in range(k):
+                buf[i] = lpf(buf[i])
+            m.time('lpf', t)
+        t = clock()
+        r = self._pack([sampler(buf[i]) for i in range(k)], soft)
+        m.time('sampler', t)
+        m.inc('demod_samples_total', siz)
+        m.inc('demod_squelched_samples_total', siz-k)
+        return r
+
+    # sampler outputs of _tapped and _metered to packed line bits, and their
+    # confidences if soft, the partial byte carries over in acc/nacc/confs
+    def _pack(self, bss, soft):
+        acc      = self.acc
+        nacc     = self.nacc
+        out      = bytearray()
+        confs    = self.confs
+        self.confs = array('H')
+        for bs in bss:
+            if soft:
+                if bs < 0:
+                    continue
+                acc = (acc<<1)|(bs&0x01)
+                confs.append(min(bs>>1, 0xffff))
+            elif bs == 2: # _NONE
+                continue
+            else:
+                acc = (acc<<1)|bs
+            nacc += 1
+            if nacc == 8:
+                out.append(acc)
+                acc = 0
+                nacc = 0
+        self.acc  = acc
+        self.nacc = nacc
+        if not soft:
+            return out
+        # hold back the confidences of the bits still in acc
+        if nacc:
+            self.confs = confs[len(confs)-nacc:]
+            del confs[len(confs)-nacc:]
+        return out, confs
+
+    def close_taps(self):
+        for sink in self.taps.values():
+            sink.close()
+
     async def q_core(self, in_rx):
         try:
             # Process a chunk of samples
@@ -259,6 +621,11 @@ class AFSKDemodulator():
             sampler  = self.sampler
             unnrzi   = self.unnrzi
             pwrmtr   = self.pwrmtr
+            sql      = self.squelch
+            packed   = self.packed
+            soft     = self.soft
+            process_block = self.process_block
+            process_block_soft = self.process_block_soft
 
             bits_q = self.bits_q   # output stream
             in_rx = in_rx or self.in_rx
@@ -275,6 +642,19 @@ class AFSKDemodulator():
                     arr = arr_siz
                     siz = len(arr)
 
+                if soft:
+                    out = process_block_soft(arr, siz)
+                    if out[0]:
+                        await bits_q.put(out) #bits_out_q
+                    in_rx.task_done() # done
+                    continue
+                if packed:
+                    out = process_block(arr, siz)
+                    if out:
+                        await bits_q.put(out) #bits_out_q
+                    in_rx.task_done() # done
+                    continue
+
                 for i in range(siz):
                     o = arr[i]
                     o = bpf(o)
@@ -282,7 +662,8 @@ class AFSKDemodulator():
                     if p < sql:
                         continue
                     o = corr(o)
-                    o = lpf(o)
+                    if lpf:
+                        o = lpf(o)
                     bs = sampler(o)
                     if bs != 2: # _NONE
                         b = unnrzi(bs)
@@ -297,32 +678,6 @@ class AFSKDemodulator():
 ##############################
 ######### OLD STUFF ##########
 ##############################
-                # # loop where we allow for inner-loop output
-                # for i in range(siz):
-                    # o = arr[i]
-                    # # print(o)
-                    # if self.debug_samples == 'in':
-                        # s = struct.pack('<h',clamps16(o)) # little-endian signed output
-                        # sys.stdout.buffer.write(s)
-                    # o = bpf(o)
-                    # if self.debug_samples == 'bpf':
-                        # s = struct.pack('<h',clamps16(o)) # little-endian signed output
-                        # sys.stdout.buffer.write(s)
-                    # o = corr(o)
-                    # if self.debug_samples == 'cor':
-                        # s = struct.pack('<h',clamps16(o)) # little-endian signed output
-                        # sys.stdout.buffer.write(s)
-                    # o = lpf(o)
-                    # if self.debug_samples == 'lpf':
-                        # s = struct.pack('<h',clamps16(o)) # little-endian signed output
-                        # sys.stdout.buffer.write(s)
-                    # bs = sampler(o)
-                    # if bs != 2: # _NONE
-                        # b = unnrzi(bs)
-                        # # eprint(b,end='')
-                        # await bits_q.put(b) #bits_out_q
-                # if self.debug_samples:
-                    # sys.stdout.buffer.flush()
 
     # def analyze(self,start_from = 100e-3):
         # o = self.o
@@ -48,6 +48,45 @@ fir_options = {
     # 'squelch'             : 300,
     # 'squelch'             : 400,
     'squelch'             : 200,
+    'discriminator'       : 'corr', # 'corr' | 'quad' | 'goertzel'
+    'sampler'             : 'zc',   # 'zc' zero crossing run lengths | 'pll'
+    'activity'            : True,   # skip the dsp on idle blocks, see ActivityGate
+    'activity_level'      : 200,    # rms of the raw input samples that wakes the gate, not the squelch scale
 }
 # bandpass_ncoefs 91
 
+
+# named tunings for the decoder bank, each decodes a different subset of frames
+fir_presets = {
+    'default' : fir_options,
+    'germany' : dict(fir_options, **{
+        'bandpass_ncoefsbaud' : 3,
+        'bandpass_width'      : 460,
+        'bandpass_amark'      : 7,
+        'bandpass_aspace'     : 24,
+        'lpf_ncoefsbaud'      : 4,
+        'lpf_f'               : 1000,
+        'lpf_width'           : 360,
+        'lpf_aboost'          : 3,
+    }),
+    'rtl_fm' : dict(fir_options, **{
+        'bandpass_ncoefsbaud' : 5,
+        'bandpass_width'      : 460,
+        'bandpass_amark'      : 6,
+        'bandpass_aspace'     : 6,
+        'lpf_ncoefsbaud'      : 5,
+        'lpf_f'               : 1000,
+        'lpf_width'           : 360,
+        'lpf_aboost'          : 3,
+    }),
+    'tnc_test' : dict(fir_options, **{
+        'bandpass_ncoefsbaud' : 5,
+        'bandpass_width'      : 400,
+        'bandpass_amark'      : 1,
+        'bandpass_aspace'     : 3,
+        'lpf_ncoefsbaud'      : 5,
+        'lpf_f'               : 800,
+        'lpf_width'           : 250,
+        'lpf_aboost'          : 3,
+    }),
+}
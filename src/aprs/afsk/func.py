@@ -267,6 +267,117 @@ else:
             return o
         return inner
 
+# magnitude response of an fir at f
+def fir_gain(coefs, scale, f, fs):
+    w = 2*math.pi*f/fs
+    re = sum(c*math.cos(w*i) for i,c in enumerate(coefs))
+    im = sum(c*math.sin(w*i) for i,c in enumerate(coefs))
+    return math.sqrt(re*re+im*im)/(scale or 1)
+
+# alternative discriminators, both integrate the tone energies over a window of
+# n samples (~1.25 baud, a single baud leaks too much between the tones) and
+# smooth the difference over k samples, so they replace the correlator AND the
+# lpf.  Output follows the correlator, space > 0, mark < 0
+
+# mark/space quadrature mixer, sliding integrate and dump over n samples
+def create_quad_disc(fmark, fspace, fs, n, k = 1, wm = 256, ws = 256): # k post boxcar, wm/ws Q8 tone weights
+    tbl = array('i', (round(16384*math.cos(2*math.pi*i/256)) for i in range(256))) # Q14 cos
+    dm = round(fmark/fs*(1<<24)) # phase steps, 24 bit accumulators, top 8 bits index tbl
+    ds = round(fspace/fs*(1<<24))
+    ring = array('i', (0 for x in range(4*n))) # the products in the window
+    box = array('i', (0 for x in range(k)))
+    acc = 0
+    ib = 0
+    pm = 0
+    ps = 0
+    im = 0
+    qm = 0
+    is_ = 0
+    qs = 0
+    i = 0
+    def inner(v:int)->int:
+        nonlocal pm,ps,im,qm,is_,qs,i,acc,ib
+        a = pm>>16
+        b = ps>>16
+        j = i<<2
+        x = (v*tbl[a])>>14
+        im += x - ring[j]
+        ring[j] = x
+        x = (v*tbl[(a-64)&0xff])>>14 # sin
+        qm += x - ring[j+1]
+        ring[j+1] = x
+        x = (v*tbl[b])>>14
+        is_ += x - ring[j+2]
+        ring[j+2] = x
+        x = (v*tbl[(b-64)&0xff])>>14
+        qs += x - ring[j+3]
+        ring[j+3] = x
+        pm = (pm+dm)&0xffffff
+        ps = (ps+ds)&0xffffff
+        i = (i+1)%n
+        x = ws*isqrt(is_*is_+qs*qs) - wm*isqrt(im*im+qm*qm)
+        acc += x - box[ib]
+        box[ib] = x
+        ib = (ib+1)%k
+        return acc//((n*k)<<8)
+    return inner
+
+# mark/space sliding goertzel over n samples.  The plain sliding goertzel comb
+# (x[n] - x[n-n]) only cancels when a tone has whole cycles in the window, which
+# mark/space at our rates never have, so the comb is applied with its phase
+# twist e^jwn, split over a second resonator per tone for the imaginary part.
+# Slightly damped (r) so the integer recursions stay stable
+def create_goertzel_disc(fmark, fspace, fs, n, k = 1, wm = 256, ws = 256, r = 0.999):
+    def coefs(f):
+        w = 2*math.pi*f/fs
+        rn = r**n
+        return (round(2*r*math.cos(w)*16384), # resonator, Q14
+                round(r*r*16384),
+                round(r*math.cos(w)*16384),   # output, y[n] - r e^-jw y[n-1]
+                round(r*math.sin(w)*16384),
+                round(rn*math.cos(w*n)*16384), # comb twist
+                round(-rn*math.sin(w*n)*16384))
+    c1m,c2m,crm,cim,kcm,ksm = coefs(fmark)
+    c1s,c2s,crs,cis,kcs,kss = coefs(fspace)
+    ring = array('i', (0 for x in range(n)))
+    box = array('i', (0 for x in range(k)))
+    acc = 0
+    ib = 0
+    i = 0
+    ym1 = ym2 = um1 = um2 = 0
+    ys1 = ys2 = us1 = us2 = 0
+    def inner(v:int)->int:
+        nonlocal i,ym1,ym2,um1,um2,ys1,ys2,us1,us2,acc,ib
+        old = ring[i]
+        ring[i] = v
+        i = (i+1)%n
+        # mark
+        y = ((c1m*ym1 - c2m*ym2)>>14) + v - ((kcm*old)>>14)
+        u = ((c1m*um1 - c2m*um2)>>14) + ((ksm*old)>>14)
+        re = y - ((crm*ym1 + cim*um1)>>14)
+        im = u + ((cim*ym1 - crm*um1)>>14)
+        pm = re*re + im*im
+        ym2 = ym1
+        ym1 = y
+        um2 = um1
+        um1 = u
+        # space
+        y = ((c1s*ys1 - c2s*ys2)>>14) + v - ((kcs*old)>>14)
+        u = ((c1s*us1 - c2s*us2)>>14) + ((kss*old)>>14)
+        re = y - ((crs*ys1 + cis*us1)>>14)
+        im = u + ((cis*ys1 - crs*us1)>>14)
+        ps = re*re + im*im
+        ys2 = ys1
+        ys1 = y
+        us2 = us1
+        us1 = u
+        x = ws*isqrt(ps) - wm*isqrt(pm)
+        acc += x - box[ib]
+        box[ib] = x
+        ib = (ib+1)%k
+        return acc//((n*k)<<8)
+    return inner
+
 if IS_UPY and HAS_C:
     def create_power_meter(siz:int,):
         from cdsp import power_meter_core
@@ -478,3 +589,81 @@ def create_sampler(fbaud,
         # print('&',o,end='')
         return o
     return inner
+
+# same as create_sampler, but also reports the confidence of each bit, the
+# magnitude of the lpf output at the bit's mid point
+# returns (magnitude<<1)|bit, or -1 when there is no bit
+def create_soft_sampler(fbaud, 
+                        fs, ):
+    tbaud = fs/fbaud #inverted for t
+    ibaud = round(tbaud) #integer step
+    ibaud_2 = round(tbaud/2)
+    last = 0
+    lastx = 0 #last crossing
+    mags = array('i', (0 for x in range(8))) # mid-bit magnitudes of the run in progress
+    outs = array('i', (0 for x in range(8))) # mid-bit magnitudes of the run being output
+    o = 0
+    oidx = 0
+    onum = 0
+    def inner(v:int)->int:
+        nonlocal last,lastx,mags,outs
+        nonlocal o,oidx,onum
+        if (last > 0) != (v > 0):
+            #detected crossing
+            if lastx > ibaud_2 and lastx < ibaud*8:
+                oidx = (lastx - ibaud_2)//ibaud+1 #number of baud periods
+                onum = oidx
+                # the correlator inverts mark/space, invert here to mark=1, space=0
+                o = 0 if last>0 else 1
+                mags,outs = outs,mags
+            else:
+                oidx = 0
+            lastx = 0
+        else:
+            lastx += 1
+            k = lastx - ibaud_2
+            if k >= 0 and k%ibaud == 0 and k < ibaud*8:
+                mags[k//ibaud] = abs(v)
+        last = v
+        if oidx == 0:
+            return -1
+        oidx -= 1
+        return (outs[onum-oidx-1]<<1)|o
+    return inner
+
+# digital pll clock recovery, drop-in for create_sampler (soft=False) or
+# create_soft_sampler (soft=True).  A 32 bit phase accumulator advances by
+# fbaud/fs a sample and the bit is sampled when it wraps, mid-bit.  Each
+# transition pulls the phase towards 0, half way between samples, keeping
+# inertia (Q8) of the error, so the clock follows baud rate error and jitter
+# instead of rounding each run length on its own.  Transitions more than a
+# quarter baud off pull harder, to acquire quickly on a short preamble
+def create_pll_sampler(fbaud,
+                       fs,
+                       soft = False,
+                       inertia = 192,     # Q8, fraction of the phase error kept at a transition
+                       inertia_far = 128, # same, error over a quarter baud
+                       ):
+    step = round((1<<32)*fbaud/fs)
+    half = step>>1 # crossings are detected up to a sample late, on average half
+    phase = 0
+    last = 0
+    _NONE = -1 if soft else 2
+    def inner(v:int)->int:
+        nonlocal phase,last
+        if (last > 0) != (v > 0):
+            e = phase-half
+            if -0x40000000 < e < 0x40000000:
+                phase = ((e*inertia)>>8) + half
+            else:
+                phase = ((e*inertia_far)>>8) + half
+        last = v
+        phase += step
+        if phase < 0x80000000:
+            return _NONE
+        phase -= 0x100000000
+        # the correlator inverts mark/space, invert here to mark=1, space=0
+        if soft:
+            return (abs(v)<<1)|(0 if v>0 else 1)
+        return 0 if v>0 else 1
+    return inner
@@ -8,6 +8,10 @@ from array import array
 import lib.upydash as _
 from lib.utils import eprint
 
+from afsk.activity import ActivityGate
+from afsk.fir_options import fir_options
+from afsk.source import U16_TO_S16
+
 #micropython/python compatibility
 from lib.compat import print_exc
 
@@ -15,11 +19,13 @@ SAMPLES_SIZE   = 20000
 
 
 async def read_samples_from_rtl_fm(in_q, 
+                                   sampling_rate  = 22050,
+                                   activity_level = fir_options['activity_level'], # raw sample rms, see ActivityGate
                                    ):
     try:
         stderr_task = None
         try:
-            cmd = 'rtl_fm -f 144.390M -s 22050 -g 10'
+            cmd = 'rtl_fm -f 144.390M -s {} -g 10'.format(sampling_rate)
             proc = await asyncio.create_subprocess_exec(
                 cmd.split()[0], *cmd.split()[1:], 
                 stdout=asyncio.subprocess.PIPE,
@@ -43,26 +49,31 @@ async def read_samples_from_rtl_fm(in_q,
             # stderr task
             stderr_task = asyncio.create_task(proc_stderr(proc.stderr))
 
-            arr = array('i',range(SAMPLES_SIZE))
-            idx = 0
+            # idle blocks never reach the queue, the pre-roll goes ahead of
+            # the first active block so the demodulator filters see it
+            gate = ActivityGate(sampling_rate = sampling_rate, level = activity_level)
             while True:
                 try:
-                    a = await proc.stdout.readexactly(2)
-                except EOFError:
+                    buf = await proc.stdout.readexactly(2*SAMPLES_SIZE)
+                except EOFError as err:
                     eprint('eof')
+                    buf = getattr(err, 'partial', b'') # IncompleteReadError, the tail
+                    buf = buf[:len(buf)&~1]
+                    if not buf:
+                        break
+                buf = bytearray(buf)
+                buf[1::2] = buf[1::2].translate(U16_TO_S16) # u16 -> s16
+                arr = array('h')
+                arr.frombytes(buf)
+                idx = len(arr)
+                pre, n = gate.check(arr, idx)
+                if pre:
+                    await in_q.put((pre, len(pre)))
+                if n:
+                    await in_q.put((arr, n))
+                    await asyncio.sleep(0)
+                if idx < SAMPLES_SIZE:
                     break
-                #eprint(a)
-                # arr[idx] = unpack('<H', a)[0] - 32768
-                arr[idx] = int.from_bytes(a,'little',signed=False) - 32768
-                idx += 1
-                if idx%SAMPLES_SIZE == 0:
-                    if afsk_detector(arr,idx): #afsk signal detector
-                        await in_q.put((arr, idx))
-                        await asyncio.sleep(0)
-                        arr = array('i',range(SAMPLES_SIZE))
-                    idx = 0
-            await in_q.put((arr, idx))
-            await asyncio.sleep(0)
         finally:
             eprint('killing rtl_fm process')
             proc.kill()
@@ -1,15 +1,15 @@
 
 import sys
 import math
-import asyncio
 
 from array import array
 
 import lib.upydash as _
-from lib.compat import Queue
 
 from lib.utils import eprint
 from lib.compat import const
+from lib.compat import print_exc
+from lib.metrics import clock
 
 from afsk.sin_table import get_sin_table
 from afsk.func import gen_bits_from_bytes
@@ -20,6 +20,9 @@ _AX25_FLAG       = const(0x7e)
 _AFSK_Q_SIZE     = const(22050//10) # internal q size
 
 
+# The add_* methods build up the samples of a transmission and take() hands
+# them over, all synchronous (aprs_mod.py never starts an event loop).  The
+# async methods are the same calls for code running in one
 class AFSKModulator():
 
     def __init__(self, sampling_rate = 22050,
@@ -27,11 +30,15 @@ class AFSKModulator():
                        amplitude     = 0x7fff,
                        is_square     = False,  # generate a square instead of sine
                        verbose       = False,
+                       metrics       = None,   # lib.metrics.Metrics, samples generated and cpu time
                        ):
 
         self.verbose = verbose 
         self.signed  = signed
-        self._q      = Queue() # internal queue
+        self._q      = [] # (array, size) blocks not yet taken
+        self.metrics = metrics
+        if metrics:
+            metrics.gauge('queue_depth', self._q.__len__, 'queue="afsk"')
         self.arr_t  = 'h' if signed else 'H'
 
         self.fmark = 1200
@@ -83,13 +90,16 @@ class AFSKModulator():
         pass
 
     async def pad_zeros(self, ms=1, bias=None):
+        self.add_zeros(ms, bias)
+
+    def add_zeros(self, ms=1, bias=None):
         siz = int(ms/1000/self.ts)
         v = 0
         if not self.signed:
             v = 0x7FFF
         if bias != None:
             v = bias
-        await self._q.put( (
+        self._q.append( (
             array(self.arr_t,[v for x in range(siz)]), 
             siz
         ))
@@ -121,25 +131,37 @@ class AFSKModulator():
             self.ts_index += 1 #increment one unit time step (ts = 1/fs)
 
     async def send_flags(self, count):
+        self.add_flags(count)
+
+    def add_flags(self, count):
         # initial flags
         flags = bytearray(count)
         for i in range(count):
             flags[i] = _AX25_FLAG
-        await self.to_samples(afsk     = flags,
-                              stop_bit = count*8)
+        self.add_samples(afsk     = flags,
+                         stop_bit = count*8)
 
     async def to_samples(self, afsk, #bytes
                                stop_bit,
                                ):
+        self.add_samples(afsk, stop_bit)
+
+    def add_samples(self, afsk, #bytes
+                          stop_bit,
+                          ):
         arr = array(self.arr_t, (0 for i in range(_AFSK_Q_SIZE)))
         idx = 0
 
         nrzi_dbg_i = 0
 
         nrzi = self.nrzi
-        _q_put = self._q.put
+        _q_put = self._q.append
         gen_samples = self.gen_baud_period_samples
         verbose = self.verbose
+        metrics = self.metrics
+        if metrics:
+            t = clock()
+            ts_index = self.ts_index
 
         try:
 
@@ -162,29 +184,35 @@ class AFSKModulator():
                     arr[idx] = sample#//_AFSK_SCALE_DOWN
                     idx += 1
                     if idx == _AFSK_Q_SIZE:
-                        await _q_put((arr, idx))
+                        _q_put((arr, idx))
                         arr = array(self.arr_t, (0 for i in range(_AFSK_Q_SIZE)))
                         idx = 0
 
-            await _q_put((arr, idx))
+            _q_put((arr, idx))
+
+            if metrics:
+                metrics.time('mod', t)
+                metrics.inc('mod_samples_total', self.ts_index-ts_index)
 
             if verbose:
                 eprint('\n')
         except Exception as err:
-            traceback.print_exc()
+            print_exc(err)
 
     # return the array and size
     async def flush(self):
-        ls = []
-        s = 0
-        while not self._q.empty():
-            a_s = await self._q.get() # array,size
-            ls.append(a_s)
-            s += a_s[1]
-        arr = array(self.arr_t, range(s))
+        return self.take()
+
+    def take(self):
+        ls = self._q
         s = 0
         for a_s in ls:
-            arr[s:s+a_s[1]] = a_s[0]
             s += a_s[1]
+        arr = array(self.arr_t, bytes(2*s))
+        s = 0
+        for a,siz in ls:
+            arr[s:s+siz] = a[:siz]
+            s += siz
+        ls.clear()
         return arr,s
 
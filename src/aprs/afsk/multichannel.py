@@ -0,0 +1,122 @@
+from ax25.ax25 import AX25
+from afsk.decoder import BlockDecoder
+
+from lib.compat import IS_UPY
+
+if not IS_UPY:
+    from os import cpu_count
+
+def _channel_worker(conn, sampling_rate, nchannels, channels, options, soft):
+    # worker process, one decoder per channel it owns
+    # in: interleaved s16 sample bytes, empty to flush and exit
+    # out: [(t, channel, frame bytes)]
+    decoders = [BlockDecoder(sampling_rate = sampling_rate,
+                             options       = options,
+                             soft          = soft) for _ in channels]
+    while True:
+        msg = conn.recv_bytes()
+        out = []
+        if not msg:
+            for ch,decoder in zip(channels, decoders):
+                out += [(t, ch, bytes(ax25.to_frame())) for t,ax25 in decoder.flush()]
+        else:
+            mv = memoryview(msg).cast('h')
+            for ch,decoder in zip(channels, decoders):
+                arr = mv[ch::nchannels] # strided view, no copy
+                out += [(t, ch, bytes(ax25.to_frame())) for t,ax25 in decoder.decode(arr, len(arr))]
+        conn.send(out)
+        if not msg:
+            break
+    conn.close()
+
+class MultiChannelDecoder():
+    # Demodulate interleaved N channel pcm, eg. two radios recorded into one
+    # stereo wav.  Each channel has its own demodulator/deframer state and is
+    # read through a strided view of the block, never deinterleaved into a
+    # copy.  Channels are spread round robin over worker processes when there
+    # is more than one channel and more than one core.  decode() and flush()
+    # return [(t, channel, ax25)] in time order, t the per channel sample count
+    def __init__(self, nchannels,
+                       sampling_rate = 22050,
+                       options       = {},
+                       soft          = False,
+                       processes     = None, # worker processes, None one per channel up to the cores, 0 in-process
+                       metrics       = None, # lib.metrics.Metrics shared by all channels, decodes in-process
+                       ):
+        self.nchannels = nchannels
+        if metrics:
+            processes = 0
+        if processes is None:
+            processes = 0 if IS_UPY or nchannels < 2 else min(nchannels, cpu_count() or 1)
+            if processes < 2:
+                processes = 0
+        self.procs = []
+        self.conns = []
+        self.decoders = []
+        if processes and not IS_UPY:
+            from multiprocessing import Pipe
+            from multiprocessing import Process
+            for w in range(processes):
+                parent, child = Pipe()
+                proc = Process(target = _channel_worker,
+                               args   = (child, sampling_rate, nchannels,
+                                         list(range(w, nchannels, processes)), options, soft),
+                               daemon = True)
+                proc.start()
+                child.close()
+                self.procs.append(proc)
+                self.conns.append(parent)
+        else:
+            self.decoders = [BlockDecoder(sampling_rate = sampling_rate,
+                                          options       = options,
+                                          soft          = soft,
+                                          metrics       = metrics) for _ in range(nchannels)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def decode(self, arr, siz = None):
+        # arr, interleaved s16 (siz samples over all channels, whole frames)
+        siz = len(arr) if siz is None else siz
+        if not siz:
+            return []
+        nch = self.nchannels
+        if self.conns:
+            msg = memoryview(arr)[:siz].cast('B')
+            for conn in self.conns:
+                conn.send_bytes(msg)
+            frames = [f for conn in self.conns for f in conn.recv()]
+        else:
+            mv = memoryview(arr)[:siz]
+            frames = []
+            for ch,decoder in enumerate(self.decoders):
+                a = mv[ch::nch]
+                frames += [(t, ch, ax25) for t,ax25 in decoder.decode(a, len(a))]
+            return sorted(frames, key = lambda f: (f[0], f[1]))
+        return [(t, ch, AX25(frame = frame)) for t,ch,frame in sorted(frames)]
+
+    def flush(self):
+        # flush every channel and stop the workers
+        if self.conns:
+            for conn in self.conns:
+                conn.send_bytes(b'')
+            frames = [f for conn in self.conns for f in conn.recv()]
+            self.close()
+            return [(t, ch, AX25(frame = frame)) for t,ch,frame in sorted(frames)]
+        frames = []
+        for ch,decoder in enumerate(self.decoders):
+            frames += [(t, ch, ax25) for t,ax25 in decoder.flush()]
+        return sorted(frames, key = lambda f: (f[0], f[1]))
+
+    def close(self):
+        for conn in self.conns:
+            conn.close()
+        for proc in self.procs:
+            proc.join(timeout = 1)
+            if proc.is_alive():
+                proc.terminate()
+        self.conns = []
+        self.procs = []
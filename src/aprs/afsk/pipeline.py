@@ -0,0 +1,129 @@
+import os
+import asyncio
+import subprocess
+from array import array
+
+from afsk.demod import AFSKDemodulator
+from afsk.source import SampleStream
+from afsk.source import open_source
+from lib.shmring import ShmRing
+
+from lib.compat import print_exc
+
+from multiprocessing import Process
+
+def dsp_worker(ring_name, ring_lock, source, sampling_rate, options, stream_type, block):
+    # DSP process: samples in, packed line bits out through the ring
+    # source is a raw or wav file path, an inherited file descriptor (int) or a command (list) to read stdout of
+    ring = ShmRing(name = ring_name, lock = ring_lock)
+    proc = None
+    try:
+        if isinstance(source, int):
+            src = SampleStream(os.fdopen(source, 'rb', buffering = 0), stream_type, sampling_rate)
+        elif isinstance(source, (list, tuple)):
+            proc = subprocess.Popen(source, stdout = subprocess.PIPE)
+            src = SampleStream(proc.stdout, stream_type, sampling_rate)
+        else:
+            src = open_source(source, stream_type, sampling_rate)
+        demod = AFSKDemodulator(in_rx         = None,
+                                bits_out_q    = None,
+                                sampling_rate = src.sampling_rate or sampling_rate,
+                                options       = options)
+        process_block = demod.process_block
+        write = ring.write
+        for arr in src.blocks(block):
+            bits = process_block(arr, len(arr))
+            if bits:
+                write(bits)
+        z = array('h', bytes(2*demod.flush_size))
+        write(process_block(z, len(z)))
+        src.close()
+    except KeyboardInterrupt:
+        pass
+    except Exception as err:
+        print_exc(err)
+    finally:
+        if proc:
+            proc.kill()
+            proc.wait()
+        ring.close_write()
+        ring.close()
+
+class AFSKPipeline():
+    # AFSKDemodulator in its own process.  Packed line bits come back through a
+    # ShmRing and are put on bits_out_q for AX25FromAFSK, so deframing and slow
+    # frame repair run here without ever holding up the sample processing.  If
+    # we fall behind by more than the ring, bits are dropped (see overrun) rather
+    # than samples
+    def __init__(self, source,          # raw or wav file path | '-' stdin | command list, eg. rtl_fm
+                       bits_out_q,
+                       sampling_rate = 22050,
+                       stream_type   = 's16',
+                       options       = {},
+                       ring_size     = 1<<16, # bytes of packed bits, ~7 min at 1200 baud
+                       block         = 2048,  # samples per dsp block
+                       poll_ms       = 10,
+                       ):
+        self.source = source
+        self.bits_q = bits_out_q
+        self.sampling_rate = sampling_rate
+        self.stream_type = stream_type
+        self.options = options
+        self.ring_size = ring_size
+        self.block = block
+        self.poll_ms = poll_ms
+        self.ring = None
+        self.proc = None
+        self.tasks = []
+
+    async def __aenter__(self):
+        self.ring = ShmRing(size = self.ring_size)
+        source = self.source
+        if source == '-':
+            source = os.dup(0) # the child's stdin is closed by multiprocessing
+        self.proc = Process(target = dsp_worker,
+                            args   = (self.ring.name, self.ring.lock, source, self.sampling_rate,
+                                      self.options, self.stream_type, self.block),
+                            daemon = True)
+        self.proc.start()
+        if isinstance(source, int):
+            os.close(source)
+        self.tasks.append(asyncio.create_task(self.ring_coro()))
+        return self
+
+    async def __aexit__(self, *args):
+        for t in self.tasks:
+            t.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.proc.join()
+        self.ring.close()
+
+    @property
+    def overrun(self):
+        return self.ring.overrun if self.ring else 0
+
+    async def join(self):
+        # until the dsp process is done and all its bits are consumed
+        await self.tasks[0]
+        await self.bits_q.join()
+
+    async def ring_coro(self):
+        try:
+            ring = self.ring
+            bits_q = self.bits_q
+            poll = self.poll_ms/1000
+            while True:
+                closed = ring.closed
+                data = ring.read(4096)
+                if data:
+                    await bits_q.put(data)
+                elif closed:
+                    break
+                else:
+                    await asyncio.sleep(poll)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            print_exc(err)
@@ -0,0 +1,81 @@
+import math
+
+from ax25.ax25 import AX25
+from ax25.hdlc import AX25_MAX_BYTES
+from afsk.bank import FrameDedup
+from afsk.decoder import BlockDecoder
+from afsk.source import SampleFile
+
+from lib.compat import IS_UPY
+
+if not IS_UPY:
+    from multiprocessing import Pool
+
+_FBAUD = 1200
+_BLOCK = 1024 # decode block size, shard boundaries are aligned to it
+
+def overlap_samples(sampling_rate, flush_size):
+    # a shard starts decoding this far before the samples it owns, enough for
+    # the filters to warm up and for the longest (fully stuffed) frame plus its
+    # leading flags to be seen whole
+    max_bits = (AX25_MAX_BYTES*8*6)//5 + 4*8
+    n = int(math.ceil(max_bits*sampling_rate/_FBAUD)) + flush_size
+    return (n+_BLOCK-1)//_BLOCK*_BLOCK
+
+def shard_bounds(nsamples, shard_size, overlap):
+    # [(decode start, own start, own stop)], own ranges tile [0, nsamples)
+    shard_size = max(_BLOCK, shard_size//_BLOCK*_BLOCK)
+    return [(max(0, s-overlap), s, min(s+shard_size, nsamples)) for s in range(0, nsamples, shard_size)]
+
+def _decode_shard(task):
+    # pool worker, decode one shard straight out of the memory map
+    # returns [(t, frame bytes)] for frames completing in the owned range
+    path, stream_type, sampling_rate, channel, options, start, own_start, own_stop, last = task
+    out = []
+    with SampleFile(path, stream_type = stream_type, sampling_rate = sampling_rate, channel = channel) as src:
+        decoder = BlockDecoder(sampling_rate = src.sampling_rate, options = options)
+        decoder.nsamples = start # absolute sample times
+        for i in range(start, own_stop, _BLOCK):
+            arr = src.samples(i, min(i+_BLOCK, own_stop))
+            out += decoder.decode(arr, len(arr))
+            del arr
+        if last:
+            out += decoder.flush()
+        # frames still in the pipe at own_stop belong to the next shard, it sees them whole
+    return [(t, bytes(ax25.to_frame())) for t,ax25 in out if t > own_start and (last or t <= own_stop)]
+
+def decode_file(path, sampling_rate = 22050, # raw files, wav files carry their own
+                      stream_type   = 's16',
+                      channel       = 0,
+                      options       = {},
+                      processes     = None,  # pool size, None is one per cpu, 0 decodes in-process
+                      shard_s       = 60,    # owned samples per shard, in seconds
+                      ):
+    # Decode a long recording by time shards in a process pool.  Each shard owns
+    # the frames that complete inside its range and decodes from overlap samples
+    # earlier so those are seen whole.  Results are stitched in time order, a
+    # frame that two shards both report at a boundary is dropped once.
+    # returns [(t, ax25)], t the sample index where the frame completed
+    with SampleFile(path, stream_type = stream_type, sampling_rate = sampling_rate, channel = channel) as src:
+        rate = src.sampling_rate
+        nsamples = src.nsamples
+    flush_size = BlockDecoder(sampling_rate = rate, options = options).demod.flush_size
+    overlap = overlap_samples(rate, flush_size)
+    bounds = shard_bounds(nsamples, int(shard_s*rate), overlap)
+    tasks = [(path, stream_type, rate, channel, options, start, own_start, own_stop, i == len(bounds)-1)
+             for i,(start, own_start, own_stop) in enumerate(bounds)]
+
+    if processes == 0 or IS_UPY or len(tasks) == 1:
+        results = [_decode_shard(task) for task in tasks]
+    else:
+        with Pool(processes) as pool:
+            results = pool.map(_decode_shard, tasks, chunksize = 1)
+
+    # stitch, shards are already in order
+    out = []
+    dedup = FrameDedup(window = 2*_BLOCK)
+    for res in results:
+        for t,frame in res:
+            if dedup.add(t, frame, 0):
+                out.append((t, AX25(frame = frame)))
+    return out
@@ -0,0 +1,251 @@
+import sys
+import struct
+
+from lib.compat import IS_UPY
+
+if not IS_UPY:
+    import mmap
+    import weakref
+
+BLOCK = 4096 # samples per block
+
+# u16 -> s16, flip the sign bit of the high byte
+U16_TO_S16 = bytes(x ^ 0x80 for x in range(256))
+
+def wav_info(buf):
+    # walk the riff chunks of a wav file (bytes like)
+    # returns (data offset, data bytes, sampling rate, channels, bytes per sample)
+    if bytes(buf[0:4]) != b'RIFF' or bytes(buf[8:12]) != b'WAVE':
+        raise Exception('not a wav file')
+    idx = 12
+    fmt = None
+    while idx+8 <= len(buf):
+        cid = bytes(buf[idx:idx+4])
+        csiz = struct.unpack('<I', buf[idx+4:idx+8])[0]
+        if cid == b'fmt ':
+            fmt = struct.unpack('<HHIIHH', buf[idx+8:idx+24])
+        elif cid == b'data':
+            if not fmt:
+                raise Exception('wav data before fmt')
+            audio_format, nch, rate, _, _, bits = fmt
+            if audio_format != 1 or bits != 16:
+                raise Exception('only 16 bit pcm wav supported')
+            return idx+8, min(csiz, len(buf)-idx-8), rate, nch, bits//8
+        idx += 8 + csiz + (csiz&1)
+    raise Exception('no wav data chunk')
+
+class SampleFile():
+    # Memory mapped samples from a raw s16/u16 (little endian) or wav file.
+    # Random access to any range without reading the whole file, the OS pages
+    # in what is used.  samples(start, stop) returns an indexable s16 sequence
+    # (a memoryview into the map for s16 mono, else a copy of just that range)
+    def __init__(self, path,
+                       stream_type   = 's16', # raw files, 's16' | 'u16'
+                       sampling_rate = None,  # raw files, wav files carry their own
+                       channel       = 0,     # which channel of an interleaved file, None all of them interleaved
+                       nchannels     = 1,     # raw files, interleaved channels
+                       ):
+        self.path = path
+        self.f = open(path, 'rb')
+        self.mm = mmap.mmap(self.f.fileno(), 0, access = mmap.ACCESS_READ)
+        if path.lower().endswith('.wav'):
+            offset, nbytes, rate, nch, _ = wav_info(self.mm)
+            stream_type = 's16'
+        else:
+            offset, nbytes, rate, nch = 0, len(self.mm), sampling_rate, nchannels
+        self.offset = offset
+        self.sampling_rate = rate
+        self.nchannels = nch
+        self.channel = channel
+        self.stream_type = stream_type
+        self.nsamples = nbytes//(2*nch)
+        self.mv = memoryview(self.mm)[offset:offset+2*nch*self.nsamples]
+        self.iters = weakref.WeakSet() # blocks() generators, closed before the map
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.nsamples
+
+    def blocks(self, block = BLOCK, start = 0, stop = None):
+        # fixed size blocks (the last one shorter) from start to stop.  A block
+        # is only valid until the next one is asked for (or close()), pages
+        # behind are given back so resident memory stays flat however long the
+        # file is
+        it = self._blocks(block, start, stop)
+        self.iters.add(it)
+        return it
+
+    def _blocks(self, block, start, stop):
+        stop = self.nsamples if stop is None else min(stop, self.nsamples)
+        mm = self.mm
+        advise = hasattr(mm, 'madvise')
+        if advise:
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        step = 2*self.nchannels
+        dropped = 0
+        arr = None
+        try:
+            for i in range(start, stop, block):
+                arr = self.samples(i, min(i+block, stop))
+                yield arr
+                arr.release()
+                if advise:
+                    done = (self.offset + i*step)//mmap.PAGESIZE*mmap.PAGESIZE
+                    if done - dropped >= 1<<20:
+                        mm.madvise(mmap.MADV_DONTNEED, dropped, done-dropped)
+                        dropped = done
+        finally:
+            if arr is not None:
+                arr.release() # closed mid file, let go of the block handed out
+
+    def samples(self, start, stop):
+        start = max(0, start)
+        stop = min(self.nsamples, stop)
+        nch = self.nchannels
+        mv = self.mv[2*nch*start:2*nch*stop]
+        if self.stream_type == 'u16':
+            b = bytearray(mv)
+            b[1::2] = b[1::2].translate(U16_TO_S16)
+            mv = memoryview(b)
+        mv = mv.cast('h')
+        if nch > 1 and self.channel is not None:
+            mv = mv[self.channel::nch]
+        return mv
+
+    def close(self):
+        # safe with blocks or samples still around: open blocks() are closed,
+        # which releases their block.  If a samples() view (or a slice of a
+        # block) is still alive the map can't be closed yet, drop it instead,
+        # it is unmapped when the last view goes
+        if self.mm is None:
+            return
+        for it in list(self.iters):
+            it.close()
+        try:
+            self.mv.release()
+            self.mm.close()
+        except BufferError:
+            pass
+        self.f.close()
+        self.mv = None
+        self.mm = None
+
+class SampleStream():
+    # Samples from a pipe or file read front to back, stdin by default.  Raw
+    # s16/u16, or wav when the stream starts with a RIFF header.  blocks()
+    # yields fixed size s16 memoryviews into one reused buffer, so a block is
+    # only valid until the next one is asked for
+    def __init__(self, f             = None,  # binary file like with readinto, None for stdin
+                       stream_type   = 's16', # raw streams, 's16' | 'u16'
+                       sampling_rate = None,  # raw streams, wav streams carry their own
+                       channel       = 0,     # None all of them interleaved
+                       nchannels     = 1,     # raw streams, interleaved channels
+                       ):
+        self.f = f or sys.stdin.buffer
+        self.stream_type = stream_type
+        self.sampling_rate = sampling_rate
+        self.channel = channel
+        self.nchannels = nchannels
+        self.head = b''       # bytes read past the header
+        self.remaining = None # wav data bytes left, None unbounded
+        self._read_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _read(self, n):
+        b = b''
+        while len(b) < n:
+            r = self.f.read(n-len(b))
+            if not r:
+                break
+            b += r
+        return b
+
+    def _read_header(self):
+        head = self._read(12)
+        if head[0:4] != b'RIFF' or head[8:12] != b'WAVE':
+            self.head = head
+            return
+        fmt = None
+        while True:
+            c = self._read(8)
+            if len(c) < 8:
+                raise Exception('no wav data chunk')
+            cid = c[0:4]
+            csiz = struct.unpack('<I', c[4:8])[0]
+            if cid == b'data':
+                break
+            body = self._read(csiz + (csiz&1))
+            if cid == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', body[0:16])
+        if not fmt:
+            raise Exception('wav data before fmt')
+        audio_format, nch, rate, _, _, bits = fmt
+        if audio_format != 1 or bits != 16:
+            raise Exception('only 16 bit pcm wav supported')
+        self.sampling_rate = rate
+        self.nchannels = nch
+        self.stream_type = 's16'
+        # streamed wavs often carry a placeholder size, trust it only if sane
+        self.remaining = csiz if 0 < csiz < 0xffffffff-0x100 else None
+
+    def blocks(self, block = BLOCK):
+        nch = self.nchannels
+        buf = bytearray(2*nch*block)
+        mv = memoryview(buf)
+        n = len(self.head)
+        buf[:n] = self.head
+        self.head = b''
+        u16 = self.stream_type == 'u16'
+        readinto = self.f.readinto
+        eof = False
+        while not eof:
+            while n < len(buf):
+                want = len(buf)
+                if self.remaining is not None:
+                    want = min(want, n+self.remaining)
+                    if want == n:
+                        break
+                r = readinto(mv[n:want])
+                if not r:
+                    break
+                n += r
+                if self.remaining is not None:
+                    self.remaining -= r
+            eof = n < len(buf)
+            n -= n % (2*nch) # whole frames
+            if not n:
+                break
+            if u16:
+                buf[1:n:2] = buf[1:n:2].translate(U16_TO_S16)
+            arr = mv[:n].cast('h')
+            if nch > 1 and self.channel is not None:
+                yield arr[self.channel::nch]
+            else:
+                yield arr
+            arr.release()
+            n = 0
+
+    def close(self):
+        if self.f is not sys.stdin.buffer:
+            self.f.close()
+
+def open_source(path, stream_type = 's16', sampling_rate = None, channel = 0, nchannels = 1):
+    # SampleFile for files we can map, SampleStream for '-' (stdin) and pipes
+    if path == '-':
+        return SampleStream(None, stream_type, sampling_rate, channel, nchannels)
+    if not IS_UPY:
+        try:
+            return SampleFile(path, stream_type, sampling_rate, channel, nchannels)
+        except (OSError, ValueError):
+            pass # not mappable, fifo or empty
+    return SampleStream(open(path, 'rb'), stream_type, sampling_rate, channel, nchannels)
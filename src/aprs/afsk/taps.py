@@ -0,0 +1,87 @@
+from array import array
+
+from lib.compat import IS_UPY
+
+if not IS_UPY:
+    import wave
+
+# Stage taps for AFSKDemodulator, taps = {stage : sink}.  The demodulator only
+# runs its tapped loop when taps are set, untapped decoding never looks at them.
+# Each block the sink gets write(arr, siz), arr an array('i') of the stage
+# output, one value per input sample (0 where the squelch skipped the sample).
+# Audio the activity gate skips never reaches the filters and is not recorded
+#   in   input samples
+#   bpf  bandpass filter
+#   pwr  power meter
+#   cor  correlator (or quad/goertzel discriminator)
+#   lpf  lowpass filter
+STAGES = ('in', 'bpf', 'pwr', 'cor', 'lpf')
+
+def clamps16_array(arr, siz):
+    a = arr[:siz]
+    if not siz or (-32768 <= min(a) and max(a) <= 32767):
+        return array('h', a) # the usual case, no python level loop
+    return array('h', (x if -32768 <= x <= 32767 else (32767 if x > 0 else -32768) for x in a))
+
+class RingTap():
+    # the last size values of a stage, preallocated, nothing grows while running
+    def __init__(self, size = 1<<16):
+        self.size = size
+        self.buf = array('i', bytes(4*size))
+        self.n = 0 # total written
+
+    def write(self, arr, siz):
+        size = self.size
+        if siz >= size:
+            self.buf[:] = arr[siz-size:siz]
+            self.n += siz
+            return
+        i = self.n % size
+        k = min(siz, size-i)
+        self.buf[i:i+k] = arr[:k]
+        if k < siz:
+            self.buf[:siz-k] = arr[k:siz]
+        self.n += siz
+
+    def samples(self):
+        # oldest first
+        if self.n < self.size:
+            return self.buf[:self.n]
+        i = self.n % self.size
+        return self.buf[i:] + self.buf[:i]
+
+    def to_wav(self, path, sampling_rate):
+        w = WavTap(path, sampling_rate)
+        s = self.samples()
+        w.write(s, len(s))
+        w.close()
+
+    def close(self):
+        pass
+
+class WavTap():
+    # stream a stage to a mono s16 wav file, a block at a time, clipped to s16
+    def __init__(self, path, sampling_rate):
+        if IS_UPY:
+            raise Exception('wave files not supported in upy')
+        self.wav = wave.open(path, 'wb')
+        self.wav.setnchannels(1)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(sampling_rate)
+
+    def write(self, arr, siz):
+        self.wav.writeframesraw(clamps16_array(arr, siz).tobytes())
+
+    def close(self):
+        if self.wav:
+            self.wav.close()
+            self.wav = None
+
+def wav_taps(stages, sampling_rate, suffix = ''):
+    # {stage : WavTap('<stage><suffix>.wav')} for a list or comma separated string of stages
+    if isinstance(stages, str):
+        stages = stages.split(',')
+    for stage in stages:
+        if stage not in STAGES:
+            raise Exception('unknown stage {}, one of {}'.format(stage, ', '.join(STAGES)))
+    return {stage : WavTap('{}{}.wav'.format(stage, suffix), sampling_rate) for stage in stages}
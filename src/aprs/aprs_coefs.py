@@ -0,0 +1,48 @@
+import sys
+
+from afsk.demod import AFSKDemodulator
+from afsk.fir_options import fir_presets
+from lib.coefcache import get_cache_dir
+from lib.coefcache import set_cache_dir
+from lib.parse_args import get_arg_val
+
+# Pre-generate the filter coefficient cache for the rates and tunings we deploy,
+# run where scipy is installed and ship lib/coefs with the rest of the code
+#   python aprs_coefs.py [-r 11025,22050] [-p default,germany] [-o '{"lpf_f":900}'] [--dir path]
+
+def main(args):
+    if '-h' in args or '--help' in args:
+        print('''APRS COEFS
+
+Usage:
+aprs_coefs.py [options]
+
+OPTIONS:
+-r, --rate       comma separated rates, 11025,22050 (default)
+-p, --presets    comma separated fir_presets names, all (default)
+-o               extra options (json), applied on top of each preset
+--dir            cache directory, lib/coefs (default) or $APRS_COEF_DIR
+''')
+        return
+    rates = get_arg_val(args, '-r') or get_arg_val(args, '--rate') or '11025,22050'
+    presets = get_arg_val(args, '-p') or get_arg_val(args, '--presets')
+    presets = presets.split(',') if presets else list(fir_presets.keys())
+    extra = get_arg_val(args, '-o')
+    if extra:
+        from json import loads
+        extra = loads(extra.replace('\'','').replace('\\',''))
+    if '--dir' in args:
+        set_cache_dir(get_arg_val(args, '--dir'))
+
+    for rate in [int(r) for r in rates.split(',')]:
+        for name in presets:
+            options = dict(fir_presets[name], **(extra or {}))
+            AFSKDemodulator(in_rx         = None,
+                            bits_out_q    = None,
+                            sampling_rate = rate,
+                            options       = options)
+            print('{} {} ok'.format(rate, name))
+    print('cache: {}'.format(get_cache_dir()))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,112 @@
+import sys
+import time
+
+from afsk.multichannel import MultiChannelDecoder
+from afsk.taps import wav_taps
+from afsk.source import SampleStream
+from afsk.source import open_source
+
+from lib.parse_args import demod_parse_args
+from lib.utils import eprint
+from lib.utils import pretty_binary
+from lib.metrics import Metrics
+from lib.metrics import MetricsExporter
+
+from lib.compat import print_exc
+
+# Synchronous demodulator, s16/u16 samples in, APRS strings out, one per line,
+# '[channel] ' first on multi channel input.  Blocks go straight through
+# BlockDecoder (one per channel), no event loop and no per bit awaits
+#   cat samples.raw | python aprs_demod.py -r 22050
+#   python aprs_demod.py -r 11025 -t u16 recording.raw
+#   python aprs_demod.py -t recording.wav
+#   python aprs_demod.py -c 2 -t s16 stereo.raw
+#   python aprs_demod.py -d bpf,lpf -t recording.wav    (writes bpf.wav, lpf.wav)
+#   python aprs_demod.py --metrics /var/lib/node_exporter/aprs.prom -t rtl_fm
+#   python aprs_demod.py -t rtl_fm
+
+def open_input(in_file, stream_type, rate, nchannels):
+    # returns (source, process or None), all channels interleaved
+    if in_file == 'rtl_fm':
+        import subprocess
+        cmd = 'rtl_fm -f 144.390M -s {} -g 10'.format(rate)
+        proc = subprocess.Popen(cmd.split(), stdout = subprocess.PIPE)
+        return SampleStream(proc.stdout, stream_type, rate), proc
+    return open_source(in_file, stream_type, rate, channel = None, nchannels = nchannels), None
+
+def main(argv):
+    args = demod_parse_args(argv)
+    rate = args['args']['rate']
+    verbose = args['args']['verbose']
+    quiet = args['args']['quiet']
+    stream_type = args['in']['type']
+    if args['args']['debug_samples'] and args['args']['metrics']:
+        eprint('# -d/--debug_samples and --metrics can not be used together')
+        return 2
+
+    write = sys.stdout.buffer.write
+    flush = sys.stdout.buffer.flush
+    def out(frames):
+        # [(t, channel, ax25)], the channel tag only on multi channel input
+        for t,ch,ax25 in frames:
+            tag = '[{}] '.format(ch).encode() if nch > 1 else b''
+            write(tag + bytes(ax25.to_aprs()) + b'\n')
+            if verbose:
+                eprint('===== DEMOD <<<<< ch={} t={:.3f}s'.format(ch, t/rate))
+                pretty_binary(ax25.to_frame())
+        if frames:
+            flush()
+        return len(frames)
+
+    src, proc = open_input(args['in']['file'], stream_type, rate, args['args']['channels'])
+    rate = src.sampling_rate or rate # wav files carry their own
+    nch = src.nchannels
+    if not quiet:
+        eprint('# APRS DEMOD')
+        eprint('# RATE {}'.format(rate))
+        eprint('# IN   {} {}{}'.format(src.stream_type, args['in']['file'],
+                                      ' ({} channels)'.format(nch) if nch > 1 else ''))
+
+    stages = args['args']['debug_samples']
+    metrics = Metrics() if args['args']['metrics'] else None
+    exporter = MetricsExporter(metrics, args['args']['metrics'], args['args']['metrics_interval']) if metrics else None
+    decoder = MultiChannelDecoder(nchannels     = nch,
+                                  sampling_rate = rate,
+                                  options       = args['args']['options'],
+                                  processes     = 0 if stages else None,
+                                  metrics       = metrics)
+    if stages:
+        # stage taps to <stage>.wav (<stage>.<channel>.wav multi channel)
+        for ch,d in enumerate(decoder.decoders):
+            d.demod.taps = wav_taps(stages, rate, '.{}'.format(ch) if nch > 1 else '')
+    nframes = 0
+    nsamples = 0
+    t = time.time()
+    try:
+        for arr in src.blocks():
+            nframes += out(decoder.decode(arr, len(arr)))
+            nsamples += len(arr)//nch
+            if exporter:
+                exporter.poll()
+        nframes += out(decoder.flush())
+    except KeyboardInterrupt:
+        pass
+    except Exception as err:
+        print_exc(err)
+    finally:
+        for d in decoder.decoders:
+            d.demod.close_taps()
+        decoder.close()
+        src.close()
+        if exporter:
+            exporter.close()
+        if proc:
+            proc.kill()
+            proc.wait()
+    dt = time.time()-t
+    if not quiet:
+        eprint('# {} samples ({:.1f}s audio) in {:.2f}s, {:.0f} samples/s ({:.1f}x realtime), {} frames'.format(
+               nsamples, nsamples/rate, dt, nsamples/dt if dt else 0, nsamples/rate/dt if dt else 0, nframes))
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,11 +1,8 @@
 import sys
 import io
-import asyncio
 import struct
 from array import array
 
-from lib.compat import Queue
-
 from ax25.defs import DecodeError
 from ax25.defs import DecodeErrorFix
 from ax25.defs import CallSSIDError
@@ -17,6 +14,7 @@ from ax25.func import do_bitstuffing
 
 import lib.upydash as _
 from lib.crc16 import crc16_ccit
+from lib.crc16 import CRC16_CCIT_GOOD
 from lib.utils import pretty_binary
 from lib.utils import eprint
 from lib.utils import format_bytes
@@ -48,6 +46,7 @@ class AX25():
                        info       = b'',
                        aprs       = None,
                        frame      = None,
+                       fcs        = None, # running crc register over frame, skip the crc pass
                        verbose    = False,
                        ):
         self.verbose = verbose
@@ -60,7 +59,7 @@ class AX25():
         self.src = None
         self.dst = None
         if frame != None:
-            self.from_frame(frame = frame)
+            self.from_frame(frame = frame, fcs = fcs)
         elif aprs != None:
             self.from_aprs(aprs = aprs)
         else:
@@ -140,11 +139,13 @@ class AX25():
         # self.info = aprs[i+1:].encode()
 
 
-    def from_frame(self, frame):
+    def from_frame(self, frame, fcs = None):
         # from bytearray to ax25 structure
         # this function is AFTER unNRZI, unstuffing, reversed
         # the BitStreamToAX25 handles that, this  function
         # only maps bytes to their field structure
+        # fcs, if the crc register was already run over the frame (HDLCDeframer)
+        # we use its verdict instead of another crc pass
 
         mv = memoryview(frame)
         if len(mv) < 3:
@@ -187,14 +188,17 @@ class AX25():
         idx += 2
 
         #crc
-        crc  = bytes(mv[stop_idx-2:stop_idx])
-        _crc = struct.pack('<H',crc16_ccit(mv[start_idx:stop_idx-2]))
-        if crc != _crc:
-            raise DecodeErrorFix(self)
+        if fcs != None:
+            if fcs != CRC16_CCIT_GOOD:
+                raise DecodeErrorFix(self)
+        else:
+            crc  = bytes(mv[stop_idx-2:stop_idx])
+            _crc = struct.pack('<H',crc16_ccit(mv[start_idx:stop_idx-2]))
+            if crc != _crc:
+                raise DecodeErrorFix(self)
 
         #if crc passes assign info, minimize assignment
-        if crc == _crc:
-            self.info = bytes(mv[idx:stop_idx-2])
+        self.info = bytes(mv[idx:stop_idx-2])
 
     @property
     def frame(self):
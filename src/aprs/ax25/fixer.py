@@ -0,0 +1,215 @@
+
+from ax25.ax25 import AX25
+from ax25.defs import DecodeErrorFix
+from ax25.hdlc import AX25_MAX_BYTES
+from ax25.hdlc import HDLCDeframer
+
+from lib.crc16 import CRC16_AX25
+from lib.crc16 import CRC16_CCIT_GOOD
+from lib.crc16 import crc16_ccit
+from lib.compat import ticks_ms
+from lib.compat import ticks_diff
+from lib.compat import const
+
+AX25_FLAG      = 0x7e
+
+# The crc is linear, flipping a bit in a frame xors the crc register with a value
+# that only depends on how far the bit is from the end of the frame.  Index the
+# syndromes by that distance, q = 8*(bytes to the end) + bit, one table then
+# serves every frame length.
+_syn = None # q -> syndrome
+_pos = None # syndrome -> q
+def get_syndrome_tables():
+    global _syn, _pos
+    if _syn is None:
+        table = CRC16_AX25
+        nbits = 8*AX25_MAX_BYTES
+        syn = [0]*nbits
+        for b in range(8):
+            d = table[1<<b]
+            for k in range(AX25_MAX_BYTES):
+                syn[8*k+b] = d
+                d = (d >> 8) ^ table[d & 0xff] # one more (zero) byte to the end
+        # crc16 ccit has a period well above our max frame, each syndrome is unique
+        _pos = {s:q for q,s in enumerate(syn)}
+        _syn = syn
+    return _syn, _pos
+
+class SyndromeFixer():
+    # Correct one or two bit errors in an un-stuffed frame from its crc syndrome
+    # instead of trying every pair of bits.  Single errors are a table lookup,
+    # double errors one lookup per bit position.  A candidate is only accepted if
+    # it parses and has valid src/dst calls, to limit mis-corrections.
+    def __init__(self, max_attempts = 64, # max candidate corrections to parse per frame
+                       max_ms       = 50, # time budget per frame
+                       ):
+        self.max_attempts = max_attempts
+        self.max_ms = max_ms
+        self.syn, self.pos = get_syndrome_tables()
+        self.counters = {
+            'frames'    : 0, # frames with a bad crc given to the fixer
+            'single'    : 0, # fixed, one bit error
+            'double'    : 0, # fixed, two bit errors
+            'failed'    : 0, # no valid correction found
+            'exhausted' : 0, # gave up on attempt/time budget
+        }
+
+    def fix(self, mv, fcs = None):
+        # mv is un-stuffed, in byte order, wrapped in flags
+        # fcs, the running crc register over the frame and its fcs if we have it
+        # returns the fixed AX25 (mv is fixed in place) or None
+        counters = self.counters
+        counters['frames'] += 1
+
+        stop_idx = len(mv)-1
+        while stop_idx > 0 and mv[stop_idx] != AX25_FLAG:
+            stop_idx -= 1
+        nbytes = stop_idx-1 # crc covered bytes, including the fcs
+        if nbytes < 3 or nbytes > AX25_MAX_BYTES:
+            counters['failed'] += 1
+            return None
+        if fcs == None:
+            fcs = crc16_ccit(mv[1:stop_idx]) ^ 0xffff
+        s = fcs ^ CRC16_CCIT_GOOD
+        if not s:
+            counters['failed'] += 1
+            return None
+
+        syn = self.syn
+        pos = self.pos
+        nbits = 8*nbytes
+        attempts = self.max_attempts
+        t0 = ticks_ms()
+
+        # single bit error
+        q = pos.get(s)
+        if q != None and q < nbits:
+            ax25 = self.try_fix(mv, stop_idx, (q,))
+            if ax25:
+                counters['single'] += 1
+                return ax25
+            attempts -= 1
+
+        # double bit error, syndrome of the pair xors to s
+        # nrzi turns one bad line bit into two adjacent bad data bits, try the closest pairs first
+        pairs = []
+        for qa in range(nbits):
+            qb = pos.get(s ^ syn[qa])
+            if qb != None and qa < qb < nbits:
+                pairs.append((qb-qa, qa, qb))
+        pairs.sort()
+        for _,qa,qb in pairs:
+            if attempts <= 0 or ticks_diff(ticks_ms(), t0) > self.max_ms:
+                counters['exhausted'] += 1
+                return None
+            ax25 = self.try_fix(mv, stop_idx, (qa,qb))
+            if ax25:
+                counters['double'] += 1
+                return ax25
+            attempts -= 1
+
+        counters['failed'] += 1
+        return None
+
+    def try_fix(self, mv, stop_idx, qs):
+        # flip the bits at distances qs from the end of the crc covered bytes
+        # keep the flips if the frame decodes with valid src/dst
+        flip(mv, stop_idx, qs)
+        try:
+            ax25 = AX25(frame = mv, fcs = CRC16_CCIT_GOOD) # the syndrome already says crc is good
+            if ax25.src.is_valid() and ax25.dst.is_valid():
+                return ax25
+        except DecodeErrorFix:
+            pass
+        flip(mv, stop_idx, qs)
+        return None
+
+def flip(mv, stop_idx, qs):
+    for q in qs:
+        idx = stop_idx-1-q//8
+        mv[idx] ^= 1<<(q%8) # lsb is the first bit on air
+
+# SoftFixer edits
+_FLIP = const(0) # the sampler got the bit wrong
+_DROP = const(1) # the sampler saw an extra bit
+_DUP  = const(2) # the sampler missed a bit
+
+def edit_bits(x, nbits, op, k):
+    # apply an edit at bit k (msb first) of the nbits wide integer x, keep the width
+    s = nbits-1-k
+    low = x & ((1<<s)-1)
+    if op == _FLIP:
+        return x ^ (1<<s)
+    if op == _DROP:
+        y = ((x >> (s+1)) << s) | low
+        return (y << 1) | (y & 0x01) # repeat the last (pad) bit
+    y = ((x >> s) << (s+1)) | (((x >> s) & 0x01) << s) | low
+    return y >> 1 # shift out a pad bit
+
+class SoftFixer():
+    # Repair on the raw line bits using the demodulator's per bit confidence.
+    # Edit the least confident line bits of a failed frame, weakest first, and
+    # re-deframe until the crc passes.  The frame's slip (how far it is off a
+    # whole byte) picks the edits: a weak bit is dropped if there is a bit too
+    # many, repeated if one is missing (the zero crossing sampler mostly slips
+    # bits), flipped in either case (a flip can make or break a stuffed bit)
+    # and only flipped, also in pairs, if the frame is aligned.  Frames off by
+    # more than a bit are not tried.  Works where the syndrome can't: bad bits
+    # that broke the stuffing/alignment, or more than two bad data bits.  Every
+    # candidate is a re-deframe and AX25FromAFSK only gets here when the syndrome
+    # failed, so by default just the two weakest bits are tried, a failed frame
+    # costs about two syndrome searches, see bench/soft_repair.py
+    def __init__(self, nweak          = 2, # number of least confident bits to consider
+                       max_candidates = 4, # give up after this many re-deframes
+                       ):
+        self.nweak = nweak
+        self.max_candidates = max_candidates
+        self.counters = {
+            'frames'  : 0,
+            'fixed'   : 0,
+            'failed'  : 0,
+            'skipped' : 0, # off by more than a bit, not tried
+        }
+
+    def fix(self, span):
+        # span from SoftHDLCDeframer, (packed, lvl, confs, lo, hi, slip)
+        # returns the fixed AX25 or None
+        counters = self.counters
+        counters['frames'] += 1
+        packed, lvl, confs, lo, hi, slip = span
+        if slip == 1:
+            ops = (_DROP, _FLIP)
+        elif slip == -1:
+            ops = (_DUP, _FLIP)
+        elif slip == 0:
+            ops = (_FLIP,)
+        else:
+            counters['skipped'] += 1
+            return None
+        nbytes = len(packed)
+        nbits = 8*nbytes
+        x = int.from_bytes(packed, 'big')
+
+        weak = sorted(range(lo, min(hi, len(confs))), key = confs.__getitem__)[:self.nweak]
+        cands = [((op,k),) for k in weak for op in ops]
+        if not slip:
+            pairs = [((_FLIP,b),(_FLIP,a)) for i,a in enumerate(weak) for b in weak[i+1:]]
+            pairs.sort(key = lambda ab: confs[ab[0][1]]+confs[ab[1][1]])
+            cands += pairs
+
+        for edits in cands[:self.max_candidates]:
+            y = x
+            for op,k in sorted(edits, key = lambda e: -e[1]): # back to front, positions stay valid
+                y = edit_bits(y, nbits, op, k)
+            for frame,fcs in HDLCDeframer(lvl).feed(y.to_bytes(nbytes, 'big')):
+                if fcs != CRC16_CCIT_GOOD:
+                    continue
+                try:
+                    ax25 = AX25(frame = memoryview(frame), fcs = fcs)
+                    if ax25.src.is_valid() and ax25.dst.is_valid():
+                        counters['fixed'] += 1
+                        return ax25
+                except DecodeErrorFix:
+                    pass
+        counters['failed'] += 1
+        return None
@@ -1,13 +1,16 @@
 
 import sys
 import io
-import asyncio
 import struct
 from array import array
 
 # from asyncio import Queue
 
 from ax25.ax25 import AX25
+from ax25.hdlc import HDLCDeframer
+from ax25.hdlc import SoftHDLCDeframer
+from ax25.fixer import SyndromeFixer
+from ax25.fixer import SoftFixer
 from ax25.func import reverse_bit_order
 from ax25.func import trim_frame
 from ax25.func import unstuff
@@ -22,6 +25,7 @@ from lib.utils import assign_bit
 from lib.utils import eprint
 
 from lib.compat import print_exc
+from lib.metrics import clock
 
 AX25_FLAG      = 0x7e
 AX25_ADDR_LEN  = 7
@@ -31,20 +35,39 @@ class AX25FromAFSK():
     def __init__(self, bits_in_q,
                        ax25_q,
                        ax25_crc_err_q = None,
-                       verbose        = False):
+                       verbose        = False,
+                       packed         = True, # bits_in_q has packed line bits (bytes), else single un-nrzi'd bits
+                       fixer          = None, # SyndromeFixer, eg. with a different budget
+                       soft           = False, # bits_in_q has (packed line bits, confidences), repair weakest bits first
+                       soft_fixer     = None,  # SoftFixer, eg. with a different budget
+                       metrics        = None,  # lib.metrics.Metrics, deframe/decode/fix cpu time and frame counts
+                       ):
         self.bits_q = bits_in_q
         self.ax25_q = ax25_q
         self.ax25_crc_err_q = ax25_crc_err_q
         self.verbose = verbose
+        self.packed = packed
+        self.fixer = fixer or SyndromeFixer()
+        self.soft = soft
+        self.soft_fixer = soft_fixer or SoftFixer()
+        self.metrics = metrics
+        if metrics:
+            metrics.queue('bits', bits_in_q)
+            metrics.queue('ax25', ax25_q)
 
         # self.frames_q = Queue()
         self.tasks = []
 
     async def __aenter__(self):
-        self.tasks.append(asyncio.create_task(self.delimin_coro()))
+        import asyncio
+        if self.packed:
+            self.tasks.append(asyncio.create_task(self.deframe_coro()))
+        else:
+            self.tasks.append(asyncio.create_task(self.delimin_coro()))
         return self
 
     async def __aexit__(self, *args):
+        import asyncio
         _.for_each(self.tasks, lambda t: t.cancel())
         await asyncio.gather(*self.tasks, return_exceptions=True)
 
@@ -79,6 +102,35 @@ class AX25FromAFSK():
         except Exception as err:
             print_exc(err)
 
+    async def deframe_coro(self):
+        # We receive chunks of packed line bits from bits_q, the deframer
+        # does nrzi, flag detection and unstuffing a byte at a time and hands
+        # back frames ready to decode
+        try:
+            soft = self.soft
+            deframer = SoftHDLCDeframer() if soft else HDLCDeframer()
+            feed = deframer.feed
+            metrics = self.metrics
+            while True:
+                data = await self.bits_q.get()
+                if metrics:
+                    t = clock()
+                if soft:
+                    frames = feed(data[0], data[1])
+                else:
+                    frames = [(frame,fcs,None) for frame,fcs in feed(data)]
+                if metrics:
+                    metrics.time('deframe', t)
+                for frame,fcs,span in frames:
+                    if self.verbose:
+                        eprint('frame')
+                    ax25 = self.decode_frame(memoryview(frame) if frame else None, fcs, span)
+                    if ax25:
+                        await self.ax25_q.put(ax25)
+                self.bits_q.task_done()
+        except Exception as err:
+            print_exc(err)
+
     async def frame_to_ax25(self, buf, stop_bit):
         mv = memoryview(buf)
         if self.verbose:
@@ -98,85 +150,60 @@ class AX25FromAFSK():
             print('-un-reversed (ax25)-')
             pretty_binary(mv)
 
-        #decode
-        try:
-            ax25 = AX25(frame = mv)
-            await self.ax25_q.put(ax25)
-            return
-        except DecodeErrorNoFix as err:
-            return
-        except DecodeErrorFix as err:
-            _ax25 = err.ax25
-
-        #try fixing src/dst
-        ax25 = self.fixer_src_dst(mv = mv)
+        ax25 = self.decode_frame(mv)
         if ax25:
             await self.ax25_q.put(ax25)
-            return
-
-        #no src/dst, don't bother additional fixing
-        #this way we avoid trying to fix messages that have no chance of fixing
-        if not (_ax25.src and _ax25.src.is_valid()) or\
-           not (_ax25.dst and _ax25.dst.is_valid()):
-            return
 
-        #try fixing info/rest of message
-        ax25 = self.fixer_info(mv = mv)
+    def decode_frame(self, mv, fcs = None, span = None):
+        # mv is un-stuffed, in byte order, wrapped in flags (None if not byte aligned)
+        # fcs, the deframer's running crc register if we have it
+        # span, the raw line bits and confidences from SoftHDLCDeframer if we have them
+        # returns the AX25 or None if we could not decode/fix it
+        if self.metrics:
+            return self._decode_frame_metered(mv, fcs, span)
+        if mv:
+            try:
+                return AX25(frame = mv, fcs = fcs)
+            except DecodeErrorNoFix as err:
+                return
+            except DecodeErrorFix as err:
+                pass
+        return self._fix(mv, fcs, span)
+
+    def _fix(self, mv, fcs, span):
+        # correct one or two bit errors from the crc syndrome, a table lookup
+        if mv:
+            ax25 = self.fixer.fix(mv, fcs)
+            if ax25:
+                return ax25
+
+        # only then edit the least confident line bits and re-deframe, for what
+        # the syndrome can't fix: broken stuffing/alignment, slipped bits
+        if span:
+            return self.soft_fixer.fix(span)
+
+    def _decode_frame_metered(self, mv, fcs, span):
+        m = self.metrics
+        t = clock()
+        if mv:
+            try:
+                ax25 = AX25(frame = mv, fcs = fcs)
+                m.time('decode', t)
+                m.inc('frames_decoded_total')
+                return ax25
+            except DecodeErrorNoFix as err:
+                m.time('decode', t)
+                m.inc('frames_failed_total')
+                return
+            except DecodeErrorFix as err:
+                pass
+        m.time('decode', t)
+        t = clock()
+        ax25 = self._fix(mv, fcs, span)
+        m.time('fix', t)
         if ax25:
-            await self.ax25_q.put(ax25)
-            return
-
-        return
-
-    def fixer_src_dst(self, mv):
-
-        flip = self.flip
-        lbits = 8*len(mv)
-
-        #try fixing src/dst
-        # print(1)
-        for flip_a in range(8,8+8*(AX25_ADDR_LEN*2)):
-            for flip_b in range(flip_a,8+8*(AX25_ADDR_LEN*2)):
-                if flip_a >= lbits or flip_b >= lbits:
-                    continue
-                try:
-                    flip(mv, flip_a, flip_b)
-                    ax25 = AX25(frame = mv)
-                    if ax25.src.is_valid() and ax25.dst.is_valid():
-                        # print('FIXED src/dst')
-                        return ax25
-                    else:
-                        flip(mv, flip_a, flip_b)
-                except DecodeErrorFix as err:
-                    pass
-                flip(mv, flip_a, flip_b)
-
-
-    def fixer_info(self, mv):
-
-        flip = self.flip
-        lbits = 8*len(mv)
-
-        #try fixing rest of message
-        for flip_a in range(8+8*(AX25_ADDR_LEN*2), 8*(len(mv)-3)):
-            for flip_b in range(flip_a,8*(len(mv)-3)):
-                if flip_a >= lbits or flip_b >= lbits:
-                    continue
-                try:
-                    flip(mv, flip_a, flip_b)
-                    ax25 = AX25(frame = mv)
-                    # print('FIXED info')
-                    return ax25
-                except DecodeErrorFix as err:
-                    pass
-                flip(mv, flip_a, flip_b)
-
-    def flip(self, frame, flip_a, flip_b):
-        idx = flip_a//8
-        bit = flip_a%8
-        frame[idx] = frame[idx] ^ (0x80>>bit)
-        if flip_a != flip_b:
-            idx = flip_b//8
-            bit = flip_b%8
-            frame[idx] = frame[idx] ^ (0x80>>bit)
-
+            m.inc('frames_decoded_total')
+            m.inc('frames_fixed_total')
+        else:
+            m.inc('frames_failed_total')
+        return ax25
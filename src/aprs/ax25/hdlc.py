@@ -0,0 +1,265 @@
+from array import array
+
+from lib.compat import const
+from lib.crc16 import CRC16_AX25
+from lib.crc16 import CRC16_CCIT_GOOD
+
+AX25_FLAG      = const(0x7e)
+AX25_MIN_BYTES = const(18)  # dst + src + control + pid + crc, same as AX25_MIN_BITS less the flags
+AX25_MAX_BYTES = const(330) # 10 addresses + control + pid + 256 info + crc
+
+# deframer events
+_EV_FLAG  = const(1)
+_EV_ABORT = const(2)
+
+# the deframer state packs the last NRZI line level, the current run of
+# consecutive 1s and whether we are hunting for a flag (after an abort)
+#   bit 0-2 : ones run (0-7)
+#   bit 3   : nrzi line level
+#   bit 4   : hunting
+_ONES  = const(0x07)
+_LVL   = const(0x08)
+_HUNT  = const(0x10)
+_NSTATES = const(32)
+
+def _step_byte(state, byte):
+    # run one input byte (8 line bits, msb first) through the bit-wise state machine
+    # returns (new state, bits, nbits, tail) where bits/nbits are the data bits
+    # (lsb first) emitted before the first event and tail is None or a tuple of
+    # (event, bits, nbits, pos), data bits emitted after each event and the bit
+    # position (0-7) in the input byte that triggered it
+    ones = state & _ONES
+    lvl  = 1 if state & _LVL else 0
+    hunt = 1 if state & _HUNT else 0
+    segs = [[0, 0, 0, 0]] # event, bits, nbits, pos
+    for i in range(8):
+        x = (byte >> (7-i)) & 0x01
+        # nrzi, no transition is a 1, transition is a 0
+        d = 1 if x == lvl else 0
+        lvl = x
+        seg = segs[-1]
+        if d:
+            # hold back 1s until we know if they are data, stuffing or a flag
+            if ones < 7:
+                ones += 1
+            if ones == 7 and not hunt:
+                hunt = 1
+                segs.append([_EV_ABORT, 0, 0, i])
+        elif ones == 6:
+            # 01111110, flag
+            hunt = 0
+            ones = 0
+            segs.append([_EV_FLAG, 0, 0, i])
+        elif hunt:
+            ones = 0
+        elif ones == 5:
+            # 111110, emit the 1s and drop the stuffed 0
+            seg[1] |= 0x1f << seg[2]
+            seg[2] += 5
+            ones = 0
+        else:
+            # emit held 1s and the 0
+            seg[1] |= ((1 << ones) - 1) << seg[2]
+            seg[2] += ones + 1
+            ones = 0
+    state = ones | (_LVL if lvl else 0) | (_HUNT if hunt else 0)
+    tail = tuple((ev, v, n, pos) for ev, v, n, pos in segs[1:]) or None
+    return state, segs[0][1], segs[0][2], tail
+
+_table = None
+def get_deframer_table():
+    # (state, byte) -> (new state, bits, nbits, tail), built once on first use
+    global _table
+    if _table is None:
+        _table = [_step_byte(s, b) for s in range(_NSTATES) for b in range(256)]
+    return _table
+
+class HDLCDeframer():
+    # Byte-at-a-time HDLC deframer.  Input is packed (msb first) demodulated line
+    # bits, still NRZI encoded and bit stuffed.  NRZI decode, flag/abort detection
+    # and unstuffing are done together by a (state, byte) lookup.  Frames are
+    # returned un-stuffed, in byte order, and wrapped in flags, ready for AX25(frame=)
+    # The fcs register is run over each byte as it completes, so every frame comes
+    # with its crc verdict: fcs == CRC16_CCIT_GOOD when the frame is good, otherwise
+    # fcs ^ CRC16_CCIT_GOOD is the error syndrome
+    __slots__ = (
+        'table',
+        'state',
+        'buf',
+        'acc',
+        'nacc',
+        'fcs',
+        'nbits',
+        'flag_end',
+    )
+
+    def __init__(self, lvl = 1):
+        self.table = get_deframer_table()
+        self.state = (_LVL if lvl else 0) | _HUNT # unnrzi starts at 1, hunt for the first flag
+        self.buf   = bytearray((AX25_FLAG,))
+        self.acc   = 0
+        self.nacc  = 0
+        self.fcs   = 0xffff
+        self.nbits = 0     # line bits fed so far
+        self.flag_end = -1 # absolute bit index of the last bit of the last flag, -1 none since an abort
+
+    def feed(self, data):
+        # consume packed line bits, return a list of complete candidate frames
+        # as (frame, fcs) tuples
+        frames = []
+        self._run(data, frames)
+        return frames
+
+    def _run(self, data, frames):
+        # the table stepping, shared with SoftHDLCDeframer.  Every frame of more
+        # than AX25_MIN_BYTES between two flags goes to _frame(), it decides
+        # what ends up in frames
+        table = self.table
+        crctbl = CRC16_AX25
+        state = self.state
+        buf   = self.buf
+        acc   = self.acc
+        nacc  = self.nacc
+        fcs   = self.fcs
+        base  = self.nbits
+        flag_end = self.flag_end
+        for bi, byte in enumerate(data):
+            state, v, n, tail = table[(state << 8) | byte]
+            if n:
+                acc |= v << nacc
+                nacc += n
+                while nacc >= 8:
+                    b = acc & 0xff
+                    buf.append(b)
+                    fcs = (fcs >> 8) ^ crctbl[(fcs ^ b) & 0xff]
+                    acc >>= 8
+                    nacc -= 8
+                if len(buf) > AX25_MAX_BYTES:
+                    # runaway frame, drop and hunt for the next flag
+                    state |= _HUNT
+                    buf = bytearray((AX25_FLAG,))
+                    acc = nacc = 0
+                    fcs = 0xffff
+                    flag_end = -1
+            if tail:
+                for ev, v, n, pos in tail:
+                    if ev == _EV_FLAG:
+                        end = base + 8*bi + pos
+                        if flag_end >= 0 and len(buf) > AX25_MIN_BYTES:
+                            self._frame(frames, buf, fcs, nacc, flag_end, end)
+                        flag_end = end
+                    else:
+                        flag_end = -1
+                    buf = bytearray((AX25_FLAG,))
+                    acc = v
+                    nacc = n
+                    fcs = 0xffff
+        self.state = state
+        self.buf   = buf
+        self.acc   = acc
+        self.nacc  = nacc
+        self.fcs   = fcs
+        self.nbits = base + 8*len(data)
+        self.flag_end = flag_end
+
+    def _frame(self, frames, buf, fcs, nacc, start, stop):
+        # buf between two flags, start and stop the absolute line bit index of
+        # the last bit of the opening and closing flag
+        # the 0 leading the flag was emitted as data, a byte aligned frame
+        # leaves exactly that one bit in the accumulator
+        if nacc == 1:
+            buf.append(AX25_FLAG)
+            frames.append((buf, fcs))
+
+def _is_header(buf):
+    # the destination call of an AX.25 header, 6 shifted characters with the
+    # address extension bit (lsb) clear.  Most failed frames are noise between
+    # real frames, 1 in 64 of those gets past this and costs a repair attempt
+    for i in range(1, 7):
+        if buf[i] & 0x01:
+            return False
+    return True
+
+# line bits we keep for re-deframing, the largest frame fully stuffed plus both flags
+_SOFT_HIST = const(AX25_MAX_BYTES*6//5 + 4)
+
+class SoftHDLCDeframer(HDLCDeframer):
+    # HDLCDeframer that also takes a confidence per line bit (array('H'), 8 per
+    # input byte).  Frames come back as (frame, fcs, span).  span is None for a
+    # good frame, otherwise the raw line bits from the opening to the closing flag
+    # for SoftFixer to retry with the least confident bits edited.  Frames that
+    # are not byte aligned (a bad bit broke the stuffing) are returned too, with
+    # frame None, as only a line bit repair can save them.
+    __slots__ = (
+        'hist',
+        'hconf',
+        'hbase',
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.hist  = bytearray() # raw input bytes
+        self.hconf = array('H')  # their confidences
+        self.hbase = 0           # absolute bit index of hist[0]
+
+    def feed(self, data, confs):
+        # keep the raw history, a frame can not be longer than _SOFT_HIST bytes
+        hist = self.hist
+        hconf = self.hconf
+        hist.extend(data)
+        hconf.extend(confs)
+
+        frames = []
+        self._run(data, frames)
+
+        # trim history
+        drop = len(hist) - _SOFT_HIST
+        if drop > 0:
+            del hist[:drop]
+            del hconf[:8*drop]
+            self.hbase += 8*drop
+        return frames
+
+    def _frame(self, frames, buf, fcs, nacc, start, stop):
+        aligned = nacc == 1
+        if aligned:
+            buf.append(AX25_FLAG)
+        if aligned and fcs == CRC16_CCIT_GOOD:
+            frames.append((buf, fcs, None))
+        elif _is_header(buf):
+            span = self.span(start-7, stop, nacc)
+            frames.append((buf if aligned else None, fcs, span))
+        elif aligned:
+            frames.append((buf, fcs, None)) # noise, no span to repair
+
+    def span(self, start, stop, nacc = 1):
+        # line bits start..stop (absolute, inclusive) re-packed from bit 0
+        # returns (packed, lvl, confs, lo, hi, slip)
+        #   lvl    the line level before start, to seed the nrzi decode
+        #   confs  the confidence of each packed bit
+        #   lo,hi  the packed bit range between the flags, the bits worth flipping
+        #   slip   data bits over (+) or short (-) of a whole byte, from nacc at
+        #          the closing flag (1 when aligned), -3..4
+        hist = self.hist
+        hconf = self.hconf
+        hbase = self.hbase
+        i = start-1-hbase
+        lvl = (hist[i>>3] >> (7-(i&7))) & 0x01 if i >= 0 else 1
+        nbits = stop-start+1
+        npacked = (nbits+7)//8+1 # at least a byte of padding, room for SoftFixer to edit
+        # the bits as one integer, bits from before the history are 0
+        i = start-hbase
+        skip = min(max(-i, 0), nbits)
+        i += skip
+        j = (i+nbits-skip+7)>>3
+        x = int.from_bytes(hist[i>>3:j], 'big') >> (8*j-(i+nbits-skip))
+        x &= (1 << (nbits-skip))-1
+        packed = bytearray((x << (8*npacked-nbits)).to_bytes(npacked, 'big'))
+        # pad with the last level, no transitions, no new flags
+        if (packed[(nbits-1)>>3] >> (7-((nbits-1)&7))) & 0x01:
+            packed[(nbits-1)>>3] |= 0xff >> (nbits&7) if nbits&7 else 0
+            packed[-1] = 0xff
+        i = start-hbase
+        confs = hconf[max(i,0):i+nbits]
+        return (packed, lvl, confs, 8, nbits-8, (nacc+2)%8-3)
+
@@ -0,0 +1,167 @@
+# Channel impairment simulator, AFSKModulator output in, the audio a radio
+# would hand us out.  Vectorized with numpy (a desktop tool, like scipy for the
+# fir design), seeded, so the same arguments always give the same samples.
+#   python -m bench.channel [-r 22050] [-n 1000] [--info 60] [--seed 1] [--snr 12] [--twist -6]
+#                           [--foffset 50] [--baud 0.01] [--drift 0.0001] [--dc 500] [--clip 0.5]
+#                           [--dropouts 0.1] [--dropout_ms 30] [--gap_ms 200] [--out corpus.wav]
+# writes the samples (raw s16, or wav by extension) and <out>.json, the
+# parameters and the aprs strings sent, in order
+import sys
+import json
+import time
+from array import array
+
+from bench.corpus import random_aprs
+from bench.corpus import modulate
+
+from lib.parse_args import get_arg_val
+
+def _np():
+    try:
+        import numpy
+    except ImportError:
+        raise Exception('Missing numpy.  Re-run with python with numpy to simulate channels.')
+    return numpy
+
+IMPAIRMENTS = {
+    'snr'        : None, # dB, white noise against the signal power, None no noise
+    'twist'      : 0,    # dB, space (2200) relative to mark (1200), de-emphasis is negative
+    'foffset'    : 0,    # Hz, shift of both tones
+    'baud'       : 0,    # fractional clock error, 0.01 is 1212 baud
+    'drift'      : 0,    # fractional clock change per second, on top of baud
+    'dc'         : 0,    # dc offset, raw sample units
+    'clip'       : None, # clip at this fraction of full scale
+    'dropouts'   : 0,    # bursts per second where the audio drops out
+    'dropout_ms' : 20,
+    'gain'       : 0.5,  # signal scale before noise, headroom for noise and dc
+}
+
+def impair(arr, rate, seed = 1, t0 = 0, **kw):
+    # arr modulator output (s16), returns array('h').  t0 is the time in seconds
+    # the block starts at, for drift
+    np = _np()
+    p = dict(IMPAIRMENTS, **kw)
+    rng = np.random.default_rng(seed)
+    x = np.frombuffer(memoryview(arr).cast('B'), dtype = '<i2').astype(np.float64)*p['gain']
+    n = len(x)
+
+    if p['twist'] or p['foffset']:
+        # in the frequency domain, tilt in dB linear in f through 0 dB at mark,
+        # and a frequency shift through the analytic signal
+        X = np.fft.rfft(x)
+        f = np.fft.rfftfreq(n, 1/rate)
+        if p['twist']:
+            X *= 10**(np.clip(p['twist']*(f-1200)/1000, -40, 40)/20)
+        if p['foffset']:
+            Z = np.zeros(n, dtype = complex)
+            Z[:len(X)] = X
+            Z[1:(n+1)//2] *= 2 # analytic, drop the negative frequencies
+            z = np.fft.ifft(Z)
+            x = np.real(z*np.exp(2j*np.pi*p['foffset']*np.arange(n)/rate))
+        else:
+            x = np.fft.irfft(X, n)
+
+    if p['baud'] or p['drift']:
+        # a transmitter clock faster by r sends the same audio in less time, read
+        # the input at positions advancing 1+r a sample (linear interpolation)
+        r = p['baud'] + p['drift']*(t0 + np.arange(n)/rate)
+        pos = np.concatenate(([0.], np.cumsum(1+r)[:-1]))
+        pos = pos[pos <= n-1]
+        x = np.interp(pos, np.arange(n), x)
+        n = len(x)
+
+    if p['snr'] is not None:
+        active = np.abs(x) > 1
+        ps = np.mean(x[active]**2) if active.any() else 0
+        x = x + rng.normal(0, np.sqrt(ps/10**(p['snr']/10)), n)
+
+    if p['dropouts']:
+        k = rng.poisson(p['dropouts']*n/rate)
+        w = int(p['dropout_ms']*rate/1000)
+        for s in rng.integers(0, max(1, n-w), k):
+            x[s:s+w] = 0
+
+    if p['dc']:
+        x += p['dc']
+    if p['clip'] is not None:
+        c = p['clip']*32767
+        x = np.clip(x, -c, c)
+    x = np.clip(np.round(x), -32768, 32767).astype('<i2')
+    return array('h', x.tobytes())
+
+def simulate(msgs, rate, seed = 1, gap_ms = 100, flags = 4, chunk = 50, **kw):
+    # yields impaired array('h') chunks of up to chunk frames, gap_ms of silence
+    # (noise, when snr is set) ahead of each frame
+    gap = array('h', bytes(2*int(gap_ms*rate/1000)))
+    t = 0
+    for i in range(0, len(msgs), chunk):
+        clean = array('h')
+        for msg in msgs[i:i+chunk]:
+            clean.extend(gap)
+            clean.extend(modulate([msg], rate, flags = flags))
+        out = impair(clean, rate, seed = (seed, i), t0 = t, **kw)
+        t += len(clean)/rate
+        yield out
+
+def write_corpus(path, n, rate = 22050, seed = 1, info_len = 60, gap_ms = 100, **kw):
+    # n frames to path (raw s16 or .wav) and the manifest to path.json
+    msgs = random_aprs(n, seed = seed, info_len = info_len)
+    wav = None
+    if path.lower().endswith('.wav'):
+        import wave
+        wav = wave.open(path, 'wb')
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        write = wav.writeframesraw
+        f = None
+    else:
+        f = open(path, 'wb')
+        write = f.write
+    nsamples = 0
+    try:
+        for arr in simulate(msgs, rate, seed = seed, gap_ms = gap_ms, **kw):
+            write(arr.tobytes())
+            nsamples += len(arr)
+    finally:
+        if wav:
+            wav.close()
+        if f:
+            f.close()
+    with open(path + '.json', 'w') as f:
+        f.write(json.dumps({
+            'rate'       : rate,
+            'seed'       : seed,
+            'info_len'   : info_len,
+            'gap_ms'     : gap_ms,
+            'impairments': dict(IMPAIRMENTS, **kw),
+            'nsamples'   : nsamples,
+            'frames'     : [m.decode() for m in msgs],
+        }, indent = 1))
+    return nsamples
+
+def load_manifest(path):
+    with open(path + '.json', 'r') as f:
+        return json.loads(f.read())
+
+def main(args):
+    kw = {}
+    for k,v in IMPAIRMENTS.items():
+        x = get_arg_val(args, '--' + k, float)
+        if x is not None:
+            kw[k] = x
+    rate = get_arg_val(args, '-r', int) or 22050
+    n = get_arg_val(args, '-n', int) or 100
+    out = get_arg_val(args, '--out') or 'corpus.wav'
+    t = time.time()
+    nsamples = write_corpus(out, n,
+                            rate     = rate,
+                            seed     = get_arg_val(args, '--seed', int) or 1,
+                            info_len = get_arg_val(args, '--info', int) or 60,
+                            gap_ms   = get_arg_val(args, '--gap_ms', float) or 100,
+                            **kw)
+    dt = time.time()-t
+    print('{} frames, {:.1f}s audio to {} in {:.1f}s ({:.0f}x realtime)'.format(n, nsamples/rate, out, dt, nsamples/rate/dt))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,49 @@
+# shared helpers for the benchmarks, run from src/aprs as python -m bench.<name>
+import time
+import asyncio
+import random
+from array import array
+
+from afsk.mod import AFSKModulator
+from afsk.decoder import BlockDecoder
+from ax25.ax25 import AX25
+
+def random_aprs(n, seed = 1, info_len = 60):
+    # n distinct aprs strings with random info
+    rnd = random.Random(seed)
+    chars = b'abcdefghijklmnopqrstuvwxyz0123456789'
+    return [b'KI5TOF>APRS,WIDE1-1:' + bytes(rnd.choice(chars) for _ in range(info_len)) for _ in range(n)]
+
+async def _modulate(msgs, rate, flags):
+    out = array('h')
+    async with AFSKModulator(sampling_rate = rate) as afsk_mod:
+        for msg in msgs:
+            afsk, stop_bit = AX25(aprs = msg).to_afsk()
+            await afsk_mod.pad_zeros(10)
+            await afsk_mod.send_flags(flags)
+            await afsk_mod.to_samples(afsk = afsk, stop_bit = stop_bit)
+            await afsk_mod.send_flags(4)
+            await afsk_mod.pad_zeros(10)
+            arr, s = await afsk_mod.flush()
+            out.extend(arr[:s])
+    return out
+
+def modulate(msgs, rate, flags = 4):
+    # clean afsk samples (array('h')) of the aprs strings, back to back
+    return asyncio.run(_modulate(msgs, rate, flags))
+
+def add_noise(arr, sigma, seed = 1, gain = 0.5):
+    # scale and add gaussian noise, clipped to s16
+    rnd = random.Random(seed)
+    return array('h', (max(-32768, min(32767, int(x*gain + rnd.gauss(0, sigma)))) for x in arr))
+
+def decode(arr, rate, options = {}, block = 4096):
+    # BlockDecoder over arr, returns ([(t, ax25)], cpu seconds)
+    decoder = BlockDecoder(sampling_rate = rate, options = options)
+    frames = []
+    t = time.process_time()
+    for i in range(0, len(arr), block):
+        blk = arr[i:i+block]
+        frames += decoder.decode(blk, len(blk))
+    frames += decoder.flush()
+    return frames, time.process_time()-t
@@ -0,0 +1,36 @@
+# Discriminator engines, cpu per second of audio and decode yield on the same corpus
+#   python -m bench.discriminators [rate] [sigma ...]
+import sys
+
+from bench.corpus import random_aprs
+from bench.corpus import modulate
+from bench.corpus import add_noise
+from bench.corpus import decode
+
+DISCRIMINATORS = ('corr', 'quad', 'goertzel')
+
+def run(rate, sigmas, discriminators = DISCRIMINATORS, nframes = 30):
+    msgs = random_aprs(nframes)
+    sent = set(msgs)
+    clean = modulate(msgs, rate)
+    secs = len(clean)/rate
+    rows = []
+    for sigma in sigmas:
+        arr = add_noise(clean, sigma, seed = sigma) if sigma else clean
+        for disc in discriminators:
+            frames, cpu = decode(arr, rate, {'discriminator' : disc})
+            ok = sum(1 for _,ax25 in frames if bytes(ax25.to_aprs()) in sent)
+            rows.append((sigma, disc, ok, cpu/secs))
+    return rows
+
+def main():
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 22050
+    sigmas = [int(x) for x in sys.argv[2:]] or [0, 4000, 8000]
+    nframes = 30
+    print('rate {} frames sent {}'.format(rate, nframes))
+    print('{:>6} {:>10} {:>6} {:>12}'.format('sigma', 'disc', 'frames', 'cpu s/s'))
+    for sigma, disc, ok, cpu in run(rate, sigmas, nframes = nframes):
+        print('{:>6} {:>10} {:>6} {:>12.3f}'.format(sigma, disc, ok, cpu))
+
+if __name__ == '__main__':
+    main()
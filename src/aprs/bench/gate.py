@@ -0,0 +1,167 @@
+# Performance regression gate.  Times the hot paths a number of times, compares
+# the medians against the baseline stored for this machine profile and exits 1
+# with a diff when one is slower by more than its threshold
+#   python -m bench.gate [-n 5] [-r 22050] [--profile name] [--threshold 10]
+#                        [--thresholds '{"crc_mbs":5}'] [--update] [--out run.json]
+# metrics, medians over the repetitions
+#   mod_sps      AFSKModulator samples per cpu second
+#   demod_rtf    AFSKDemodulator (BlockDecoder) cpu seconds per second of audio, lower is better
+#   deframe_fps  HDLCDeframer + AX25 decode frames per cpu second
+#   crc_mbs      crc16_ccit MB per cpu second
+# baselines live in bench/baselines/<profile>.json, written on the first run for
+# a profile and by --update.  A metric regresses when its median is worse than
+# the baseline median by more than the threshold (percent) and worse than every
+# baseline repetition, so a noisy baseline does not fail runs on its own noise
+import os
+import re
+import sys
+import json
+import time
+import platform
+from statistics import median
+
+from ax25.hdlc import HDLCDeframer
+from ax25.from_afsk import AX25FromAFSK
+from afsk.demod import AFSKDemodulator
+from lib.crc16 import crc16_ccit
+
+from bench.corpus import random_aprs
+from bench.corpus import modulate
+from bench.corpus import decode
+
+from lib.parse_args import get_arg_val
+
+BASELINE_DIR = __file__.rsplit('/', 1)[0] + '/baselines'
+
+# True where bigger is better
+METRICS = {
+    'mod_sps'     : True,
+    'demod_rtf'   : False,
+    'deframe_fps' : True,
+    'crc_mbs'     : True,
+}
+THRESHOLD = 10 # percent
+
+def profile_name():
+    # one baseline per machine and interpreter
+    name = '{}-{}-{}-{}'.format(platform.node(), platform.machine(),
+                                platform.python_implementation(), '.'.join(platform.python_version_tuple()[:2]))
+    return re.sub('[^A-Za-z0-9_.-]', '_', name)
+
+def _rate(fn, min_time = 0.25):
+    # units per cpu second, fn() run until min_time has passed, fn returns its units
+    n = 0
+    t = time.process_time()
+    while True:
+        n += fn()
+        dt = time.process_time()-t
+        if dt >= min_time:
+            return n/dt
+
+def measure(rate = 22050, nframes = 6):
+    # one repetition of every metric, {metric : value}
+    msgs = random_aprs(nframes)
+    t = time.process_time()
+    arr = modulate(msgs, rate)
+    mod_sps = len(arr)/(time.process_time()-t)
+
+    frames, cpu = decode(arr, rate)
+    demod_rtf = cpu/(len(arr)/rate)
+    if len(frames) != nframes:
+        raise Exception('decoded {} of {} frames, fix decoding before timing it'.format(len(frames), nframes))
+
+    demod = AFSKDemodulator(in_rx = None, bits_out_q = None, sampling_rate = rate)
+    bits = demod.process_block(arr, len(arr))
+    from_afsk = AX25FromAFSK(None, None)
+    def deframe():
+        return sum(1 for frame,fcs in HDLCDeframer().feed(bits) if from_afsk.decode_frame(memoryview(frame), fcs))
+
+    buf = memoryview(bytes(range(256))*256)
+    def crc():
+        crc16_ccit(buf)
+        return len(buf)/(1<<20)
+
+    return {
+        'mod_sps'     : mod_sps,
+        'demod_rtf'   : demod_rtf,
+        'deframe_fps' : _rate(deframe),
+        'crc_mbs'     : _rate(crc),
+    }
+
+def run(reps = 5, rate = 22050):
+    # {metric : [value per repetition]}
+    runs = [measure(rate) for _ in range(reps)]
+    return {k : [r[k] for r in runs] for k in METRICS}
+
+def compare(baseline, current, thresholds = {}):
+    # [(metric, base median, current median, change %, threshold, regressed)],
+    # change positive is better
+    rows = []
+    for k,higher in METRICS.items():
+        if k not in baseline or k not in current:
+            continue
+        b = median(baseline[k])
+        c = median(current[k])
+        change = 100*(c-b)/b if higher else 100*(b-c)/b
+        th = thresholds.get(k, THRESHOLD)
+        worst = min(baseline[k]) if higher else max(baseline[k])
+        beyond = c < worst if higher else c > worst
+        rows.append((k, b, c, change, th, change < -th and beyond))
+    return rows
+
+def print_diff(rows, profile):
+    print('profile {}'.format(profile))
+    print('{:>12} {:>12} {:>12} {:>9} {:>9}  {}'.format('metric', 'baseline', 'current', 'change%', 'limit%', ''))
+    for k,b,c,change,th,bad in rows:
+        print('{:>12} {:>12.4g} {:>12.4g} {:>+9.1f} {:>9.1f}  {}'.format(k, b, c, change, -th, 'REGRESSED' if bad else 'ok'))
+
+def load_baseline(profile):
+    try:
+        with open('{}/{}.json'.format(BASELINE_DIR, profile), 'r') as f:
+            return json.loads(f.read())
+    except OSError:
+        return None
+
+def save_baseline(profile, res):
+    os.makedirs(BASELINE_DIR, exist_ok = True)
+    with open('{}/{}.json'.format(BASELINE_DIR, profile), 'w') as f:
+        f.write(json.dumps(res, indent = 1))
+
+def main(args):
+    reps = get_arg_val(args, '-n', int) or 5
+    rate = get_arg_val(args, '-r', int) or 22050
+    profile = get_arg_val(args, '--profile') or profile_name()
+    thresholds = {k : get_arg_val(args, '--threshold', float) or THRESHOLD for k in METRICS}
+    th = get_arg_val(args, '--thresholds')
+    if th:
+        thresholds.update(json.loads(th))
+    res = {
+        'profile' : profile,
+        'rate'    : rate,
+        'reps'    : reps,
+        'time'    : int(time.time()),
+        'metrics' : run(reps, rate),
+    }
+    path = get_arg_val(args, '--out')
+    if path:
+        with open(path, 'w') as f:
+            f.write(json.dumps(res, indent = 1))
+    base = load_baseline(profile)
+    if base is None or '--update' in args:
+        save_baseline(profile, res)
+        print('baseline for {} written'.format(profile))
+        print_diff(compare(res['metrics'], res['metrics'], thresholds), profile)
+        return 0
+    if base.get('rate') != rate:
+        print('baseline for {} is at {}, not {}'.format(profile, base.get('rate'), rate))
+        return 2
+    rows = compare(base['metrics'], res['metrics'], thresholds)
+    print_diff(rows, profile)
+    bad = [r[0] for r in rows if r[5]]
+    if bad:
+        print('regressed: {}'.format(', '.join(bad)))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
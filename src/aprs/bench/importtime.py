@@ -0,0 +1,83 @@
+# Cold start of the command line tools, from python -X importtime.  aprs.py
+# starts aprs_mod.py for every beacon, its imports are most of the latency
+#   python -m bench.importtime [-n 7] [--budget '{"aprs_mod":40}'] [--top 8]
+# per tool, best of n fresh interpreters:
+#   import_ms   cumulative import time of the tool's module
+#   start_ms    wall time of python -c "import <tool>" less python -c pass
+# budgets in ms of import_ms, exits 1 when a tool is over
+import os
+import sys
+import json
+import time
+import subprocess
+
+from lib.parse_args import get_arg_val
+
+BUDGETS = {
+    'aprs_mod'   : 40,
+    'aprs_demod' : 80,
+}
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _run(code, importtime = False):
+    args = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+    t = time.perf_counter()
+    p = subprocess.run(args, cwd = _ROOT, capture_output = True, text = True)
+    dt = time.perf_counter()-t
+    if p.returncode:
+        raise Exception('{} failed\n{}'.format(' '.join(args), p.stderr))
+    return dt, p.stderr
+
+def parse_importtime(text):
+    # [(module, self us, cumulative us, depth)] in the order python reports them
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        name = parts[2].rstrip()
+        rows.append((name.strip(), int(parts[0]), int(parts[1]), (len(name)-len(name.lstrip()))//2))
+    return rows
+
+def measure(module, n = 7):
+    # (import ms, start ms, importtime rows of the best run)
+    best = None
+    for _ in range(n):
+        _, err = _run('import ' + module, importtime = True)
+        rows = parse_importtime(err)
+        us = next(cum for name,_,cum,depth in rows if name == module and depth == 0)
+        if best is None or us < best[0]:
+            best = (us, rows)
+    base = min(_run('pass')[0] for _ in range(n))
+    start = min(_run('import ' + module)[0] for _ in range(n))
+    return best[0]/1000, max(0, start-base)*1000, best[1]
+
+def heaviest(rows, top = 8):
+    # the most expensive top level and first level imports, by cumulative time
+    return sorted(((cum, name) for name,_,cum,depth in rows if depth <= 1), reverse = True)[:top]
+
+def main(args):
+    n = get_arg_val(args, '-n', int) or 7
+    top = get_arg_val(args, '--top', int) or 8
+    budgets = dict(BUDGETS)
+    b = get_arg_val(args, '--budget')
+    if b:
+        budgets.update(json.loads(b))
+    over = []
+    for module,budget in budgets.items():
+        import_ms, start_ms, rows = measure(module, n)
+        ok = import_ms <= budget
+        if not ok:
+            over.append(module)
+        print('{:<12} import {:6.1f} ms  start {:6.1f} ms  budget {:5.1f} ms  {}'.format(
+              module, import_ms, start_ms, budget, 'ok' if ok else 'OVER'))
+        for cum,name in heaviest(rows, top):
+            print('    {:8.1f} ms  {}'.format(cum/1000, name))
+    if over:
+        print('over budget: {}'.format(', '.join(over)))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,121 @@
+# Modulate -> demodulate loopback across sampling rates, vox and frame sizes,
+# results as json so runs can be compared by machine
+#   python -m bench.loopback [-r 11025,22050] [-n 20] [-s 10,60,200] [-o '{json options}'] [--out results.json]
+# per case:
+#   mod_sps       modulated samples per cpu second (AX25 + AFSKModulator)
+#   demod_rtf     demodulation cpu seconds per second of audio, < 1 is faster than real time
+#   stages        cpu seconds per second of audio of each stage run on its own
+#   frames_per_s  decoded frames per demodulation cpu second
+#   yield         decoded/sent
+import sys
+import json
+import time
+import platform
+from array import array
+
+from afsk.demod import AFSKDemodulator
+from ax25.hdlc import HDLCDeframer
+from ax25.from_afsk import AX25FromAFSK
+
+from bench.corpus import random_aprs
+from bench.corpus import modulate
+from bench.corpus import decode
+
+from lib.parse_args import get_arg_val
+
+VOX_FLAGS = 150 # aprs_mod.py -vox preamble
+
+def stage_times(arr, rate, options = {}):
+    # each stage over the previous stage's output, cpu seconds per stage
+    demod = AFSKDemodulator(in_rx = None, bits_out_q = None, sampling_rate = rate, options = options)
+    demod.gate = None # every sample through every stage
+    times = {}
+    def timed(name, fn, xs):
+        out = array('i', bytes(4*len(xs)))
+        t = time.process_time()
+        for i in range(len(xs)):
+            out[i] = fn(xs[i])
+        times[name] = time.process_time()-t
+        return out
+    o = timed('bpf', demod.bpf, arr)
+    p = timed('pwr', demod.pwrmtr, o)
+    sql = demod.squelch
+    o = array('i', (o[i] for i in range(len(o)) if p[i] >= sql))
+    o = timed('cor', demod.corr, o)
+    if demod.lpf:
+        o = timed('lpf', demod.lpf, o)
+    bs = timed('sampler', demod.sampler, o)
+    bits = bytearray()
+    acc = 0
+    nacc = 0
+    for b in bs:
+        if b != 2: # _NONE
+            acc = (acc<<1)|b
+            nacc += 1
+            if nacc == 8:
+                bits.append(acc)
+                acc = 0
+                nacc = 0
+    t = time.process_time()
+    from_afsk = AX25FromAFSK(None, None)
+    for frame,fcs in HDLCDeframer().feed(bits):
+        from_afsk.decode_frame(memoryview(frame), fcs)
+    times['deframe'] = time.process_time()-t
+    return times
+
+def run_case(rate, vox, info_len, nframes, options = {}):
+    msgs = random_aprs(nframes, seed = info_len, info_len = info_len)
+    sent = set(msgs)
+    t = time.process_time()
+    arr = modulate(msgs, rate, flags = VOX_FLAGS if vox else 4)
+    tmod = time.process_time()-t
+    secs = len(arr)/rate
+    frames, cpu = decode(arr, rate, options)
+    ok = sum(1 for _,ax25 in frames if bytes(ax25.to_aprs()) in sent)
+    stages = stage_times(arr, rate, options)
+    return {
+        'rate'         : rate,
+        'vox'          : vox,
+        'info_len'     : info_len,
+        'frames'       : nframes,
+        'audio_s'      : round(secs, 3),
+        'mod_sps'      : round(len(arr)/tmod),
+        'demod_rtf'    : round(cpu/secs, 4),
+        'stages'       : {k : round(v/secs, 4) for k,v in stages.items()},
+        'frames_per_s' : round(ok/cpu, 2),
+        'decoded'      : ok,
+        'yield'        : round(ok/nframes, 4),
+    }
+
+def run(rates = (11025, 22050), voxes = (False, True), sizes = (10, 60, 200), nframes = 20, options = {}):
+    return {
+        'machine' : {
+            'node'     : platform.node(),
+            'machine'  : platform.machine(),
+            'python'   : platform.python_implementation() + ' ' + platform.python_version(),
+            'platform' : platform.platform(),
+        },
+        'options' : options,
+        'time'    : int(time.time()),
+        'results' : [run_case(rate, vox, size, nframes, options) for rate in rates for vox in voxes for size in sizes],
+    }
+
+def main(args):
+    rates = get_arg_val(args, '-r') or '11025,22050'
+    sizes = get_arg_val(args, '-s') or '10,60,200'
+    nframes = get_arg_val(args, '-n', int) or 20
+    options = get_arg_val(args, '-o')
+    options = json.loads(options) if options else {}
+    res = run(rates   = [int(x) for x in rates.split(',')],
+              sizes   = [int(x) for x in sizes.split(',')],
+              nframes = nframes,
+              options = options)
+    out = json.dumps(res, indent = 1)
+    path = get_arg_val(args, '--out')
+    if path:
+        with open(path, 'w') as f:
+            f.write(out)
+    print(out)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,281 @@
+# FIR option search, the "optimizer tuning" behind the fir_options comments.
+# Scores candidates by frames decoded over one or more recordings, a corpus
+# with a bench.channel manifest (<path>.json) only counts the frames it sent
+#   python -m bench.optimize corpus.wav [more.raw ...] [-r 22050] [-m grid|random|bayes] [-n 60]
+#                            [-p processes] [--seed 1] [--top 10] [-o '{fixed options}']
+#                            [--space '{"squelch":[100,200]}'] [--coefs dir] [--out results.json]
+# The bandpass output only depends on the bandpass_* options, each worker
+# filters a corpus once per bandpass design and runs every candidate sharing it
+# from the cached output.  Candidates are spread over a process pool grouped by
+# bandpass design.  Prints a ranked table and the best options as json, ready
+# for -o or fir_presets
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import itertools
+from array import array
+from collections import OrderedDict
+
+from afsk.demod import AFSKDemodulator
+from afsk.decoder import BlockDecoder
+from afsk.fir_options import fir_options
+from afsk.source import SampleFile
+
+from lib.coefcache import set_cache_dir
+from lib.parse_args import get_arg_val
+
+SPACE = {
+    'bandpass_ncoefsbaud' : [3, 4, 5],
+    'bandpass_width'      : [360, 400, 460],
+    'bandpass_amark'      : [1, 2, 4, 7],
+    'bandpass_aspace'     : [2, 3, 6, 12, 24],
+    'lpf_f'               : [800, 1000],
+    'lpf_width'           : [250, 360],
+    'lpf_aboost'          : [1, 3],
+    'squelch'             : [100, 200, 300],
+}
+BPF_KEYS = ('bandpass_ncoefsbaud', 'bandpass_width', 'bandpass_amark', 'bandpass_aspace')
+
+_BPF_CACHE_SIZE = 4
+_BLOCK = 4096
+
+def load_corpus(path, rate = None):
+    # (name, rate, array('h'), set of aprs bytes sent or None)
+    with SampleFile(path, 's16', rate) as sf:
+        samples = array('h', sf.samples(0, len(sf)))
+        rate = sf.sampling_rate
+    sent = None
+    try:
+        with open(path + '.json', 'r') as f:
+            sent = set(m.encode() for m in json.loads(f.read())['frames'])
+    except (OSError, ValueError, KeyError):
+        pass
+    return (os.path.basename(path), rate, samples, sent)
+
+def bandpass(samples, rate, options):
+    # bandpass output of samples and a second of silence for the filter tails
+    bpf = AFSKDemodulator(in_rx = None, bits_out_q = None, sampling_rate = rate, options = options).bpf
+    out = array('i', map(bpf, samples))
+    out.extend(map(bpf, bytes(rate)))
+    return out
+
+def score_bandpassed(filtered, rate, options, sent = None):
+    # frames decoded from bandpass output, the demodulator's own bpf skipped.
+    # The activity gate looks at raw input, it is off here, it never changes
+    # what decodes only how much work it takes
+    decoder = BlockDecoder(sampling_rate = rate, options = options)
+    decoder.demod.bpf = lambda x: x
+    decoder.demod.gate = None
+    frames = set()
+    for i in range(0, len(filtered), _BLOCK):
+        blk = filtered[i:i+_BLOCK]
+        frames.update(bytes(ax25.to_aprs()) for _,ax25 in decoder.decode(blk, len(blk)))
+    frames.update(bytes(ax25.to_aprs()) for _,ax25 in decoder.flush())
+    return len(frames & sent) if sent is not None else len(frames)
+
+# worker state, set once per process by _init
+_corpora = []
+_bpf_cache = OrderedDict()
+
+def _init(paths, rate, coefdir):
+    global _corpora
+    if coefdir:
+        set_cache_dir(coefdir)
+    _corpora = [load_corpus(path, rate) for path in paths]
+
+def _evaluate_group(candidates):
+    # candidates share a bandpass design, returns [(options, [score per corpus])]
+    key = tuple(candidates[0][k] for k in BPF_KEYS)
+    filtered = _bpf_cache.pop(key, None)
+    if filtered is None:
+        filtered = [bandpass(samples, rate, candidates[0]) for _,rate,samples,_ in _corpora]
+        while len(_bpf_cache) >= _BPF_CACHE_SIZE:
+            _bpf_cache.popitem(last = False)
+    _bpf_cache[key] = filtered
+    return [(options, [score_bandpassed(f, rate, options, sent) for f,(_,rate,_,sent) in zip(filtered, _corpora)])
+            for options in candidates]
+
+class Evaluator():
+    # runs candidate options over the corpora, in a pool when processes > 1
+    def __init__(self, paths, rate = None, processes = None, coefdir = None):
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        args = (paths, rate, coefdir)
+        self.pool = None
+        if self.processes > 1:
+            from multiprocessing import Pool
+            self.pool = Pool(self.processes, initializer = _init, initargs = args)
+        else:
+            _init(*args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def evaluate(self, candidates):
+        groups = OrderedDict()
+        for options in candidates:
+            groups.setdefault(tuple(options[k] for k in BPF_KEYS), []).append(options)
+        groups = list(groups.values())
+        if self.pool:
+            results = self.pool.imap_unordered(_evaluate_group, groups)
+        else:
+            results = map(_evaluate_group, groups)
+        return [r for rs in results for r in rs]
+
+    def close(self):
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+def grid(space):
+    keys = list(space)
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+def _key(params, space):
+    return tuple(params[k] for k in space)
+
+def _random_params(space, rnd):
+    return {k : rnd.choice(v) for k,v in space.items()}
+
+def _tpe_params(space, results, rnd, ncandidates = 24, gamma = 0.25):
+    # tree structured parzen estimator over the discrete space: per option the
+    # value frequencies in the best gamma of the results (l) and the rest (g),
+    # sample from l, keep the candidate with the best l/g
+    ranked = sorted(results, key = lambda r: -r[1])
+    ngood = max(1, int(len(ranked)*gamma))
+    good, bad = ranked[:ngood], ranked[ngood:]
+    def density(rs, k):
+        n = len(space[k])
+        return {v : (sum(1 for r in rs if r[0][k] == v)+1)/(len(rs)+n) for v in space[k]}
+    l = {k : density(good, k) for k in space}
+    g = {k : density(bad, k) for k in space}
+    best, best_ratio = None, -1
+    for _ in range(ncandidates):
+        params = {}
+        ratio = 1
+        for k,vs in space.items():
+            v = rnd.choices(vs, weights = [l[k][x] for x in vs])[0]
+            params[k] = v
+            ratio *= l[k][v]/g[k][v]
+        if ratio > best_ratio:
+            best, best_ratio = params, ratio
+    return best
+
+def search(evaluator, space = SPACE, method = 'random', n = 60, seed = 1, options = {}, batch = None, log = None):
+    # returns [(params, total, [score per corpus])] best first, params only the
+    # searched options, the rest come from fir_options and options
+    base = dict(fir_options, **options)
+    rnd = random.Random(seed)
+    batch = batch or max(4, evaluator.processes)
+    seen = set()
+    results = []
+    def run(params_list):
+        params_list = [p for p in params_list if _key(p, space) not in seen]
+        seen.update(_key(p, space) for p in params_list)
+        for opts,scores in evaluator.evaluate([dict(base, **p) for p in params_list]):
+            results.append(({k : opts[k] for k in space}, sum(scores), scores))
+        if log:
+            log(len(results), max(r[1] for r in results) if results else 0)
+    def fresh(make, k):
+        # up to k distinct unseen params, gives up on a nearly exhausted space
+        out, keys = [], set()
+        for _ in range(20*k):
+            if len(out) == k:
+                break
+            p = make()
+            key = _key(p, space)
+            if key not in seen and key not in keys:
+                keys.add(key)
+                out.append(p)
+        return out
+    if method == 'grid':
+        run(list(grid(space)))
+    elif method == 'random':
+        run(fresh(lambda: _random_params(space, rnd), n))
+    elif method == 'bayes':
+        run(fresh(lambda: _random_params(space, rnd), min(n, max(batch, n//4))))
+        while len(results) < n:
+            todo = fresh(lambda: _tpe_params(space, results, rnd), min(batch, n-len(results)))
+            if not todo:
+                break
+            run(todo)
+    else:
+        raise Exception('unknown search method {}, one of grid, random, bayes'.format(method))
+    return sorted(results, key = lambda r: (-r[1], _key(r[0], space)))
+
+def print_table(results, names, space, top = 10):
+    keys = list(space)
+    heads = ['rank', 'total'] + names + [k.replace('bandpass_', 'bp_') for k in keys]
+    widths = [max(6, len(h)) for h in heads]
+    print(' '.join('{:>{}}'.format(h, w) for h,w in zip(heads, widths)))
+    for i,(params,total,scores) in enumerate(results[:top]):
+        row = [i+1, total] + scores + [params[k] for k in keys]
+        print(' '.join('{:>{}}'.format(x, w) for x,w in zip(row, widths)))
+
+def main(args):
+    paths = []
+    i = 0
+    while i < len(args):
+        if args[i].startswith('-'):
+            i += 2 # every option takes a value
+            continue
+        paths.append(args[i])
+        i += 1
+    if not paths:
+        print('usage: python -m bench.optimize corpus.wav [more.raw ...] [-r rate] [-m grid|random|bayes] [-n candidates]')
+        return 1
+    options = get_arg_val(args, '-o')
+    options = json.loads(options) if options else {}
+    space = dict(SPACE)
+    s = get_arg_val(args, '--space')
+    if s:
+        space.update(json.loads(s))
+    for k in options:
+        space.pop(k, None) # fixed
+    method = get_arg_val(args, '-m') or 'random'
+    n = get_arg_val(args, '-n', int) or 60
+    top = get_arg_val(args, '--top', int) or 10
+    coefdir = get_arg_val(args, '--coefs') or os.path.join(tempfile.gettempdir(), 'aprs_coefs')
+    os.makedirs(coefdir, exist_ok = True)
+    t = time.time()
+    with Evaluator(paths,
+                   rate      = get_arg_val(args, '-r', int),
+                   processes = get_arg_val(args, '-p', int),
+                   coefdir   = coefdir) as ev:
+        results = search(ev, space,
+                         method  = method,
+                         n       = n,
+                         seed    = get_arg_val(args, '--seed', int) or 1,
+                         options = options,
+                         log     = lambda k, best: print('{} evaluated, best {}, {:.0f}s'.format(k, best, time.time()-t), file = sys.stderr))
+    if not results:
+        print('nothing evaluated')
+        return 1
+    names = [os.path.basename(p) for p in paths]
+    print('{} {} candidates over {} in {:.0f}s'.format(len(results), method, ', '.join(names), time.time()-t))
+    print_table(results, names, space, top)
+    best = dict(fir_options, **options)
+    best.update(results[0][0])
+    print(json.dumps(best, indent = 4))
+    path = get_arg_val(args, '--out')
+    if path:
+        with open(path, 'w') as f:
+            f.write(json.dumps({
+                'corpora' : names,
+                'method'  : method,
+                'space'   : space,
+                'options' : options,
+                'results' : [{'params' : p, 'total' : tot, 'scores' : sc} for p,tot,sc in results],
+                'best'    : best,
+            }, indent = 1))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,40 @@
+# Zero crossing vs pll sampler on a corpus with baud rate error, decoded frames
+# per cpu second
+#   python -m bench.pll [rate] [sigma ...]
+import sys
+
+from bench.corpus import random_aprs
+from bench.corpus import modulate
+from bench.corpus import add_noise
+from bench.corpus import decode
+
+SAMPLERS = ('zc', 'pll')
+BAUD_ERRORS = (-0.01, 0, 0.01)
+
+def run(rate, sigmas, samplers = SAMPLERS, errors = BAUD_ERRORS, nframes = 30):
+    msgs = random_aprs(nframes)
+    sent = set(msgs)
+    rows = []
+    for err in errors:
+        # modulated at a slightly different rate and decoded at rate, tones and
+        # baud both move by err, like a transmitter with a skewed clock
+        clean = modulate(msgs, round(rate/(1+err)))
+        for sigma in sigmas:
+            arr = add_noise(clean, sigma, seed = sigma) if sigma else clean
+            for sampler in samplers:
+                frames, cpu = decode(arr, rate, {'sampler' : sampler})
+                ok = sum(1 for _,ax25 in frames if bytes(ax25.to_aprs()) in sent)
+                rows.append((err, sigma, sampler, ok, ok/cpu, cpu*rate/len(arr)))
+    return rows
+
+def main():
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 22050
+    sigmas = [int(x) for x in sys.argv[2:]] or [0, 5000, 6000]
+    nframes = 30
+    print('rate {} frames sent {}'.format(rate, nframes))
+    print('{:>6} {:>6} {:>8} {:>6} {:>10} {:>9}'.format('baud', 'sigma', 'sampler', 'frames', 'frames/s', 'cpu s/s'))
+    for err, sigma, sampler, ok, fps, cpu in run(rate, sigmas, nframes = nframes):
+        print('{:>+5.0%} {:>6} {:>8} {:>6} {:>10.1f} {:>9.3f}'.format(err, sigma, sampler, ok, fps, cpu))
+
+if __name__ == '__main__':
+    main()
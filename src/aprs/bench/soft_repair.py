@@ -0,0 +1,79 @@
+# Hard (syndrome) vs soft (confidence ordered) frame repair on noisy loopback
+#   python -m bench.soft_repair [rate] [sigma ...]
+# prints, per noise level, frames recovered, recovered frames per cpu second
+# of the deframe + repair stage (demodulation is shared and not counted, best
+# of 5 runs) and mis-corrected frames (decoded, but not a frame we sent).  Soft
+# runs the syndrome fixer first and SoftFixer on what is left.  It gains a frame
+# now and then at about half the hard frames per cpu second, which is why soft
+# repair is off by default
+import sys
+import time
+
+from afsk.demod import AFSKDemodulator
+from ax25.hdlc import HDLCDeframer
+from ax25.hdlc import SoftHDLCDeframer
+from ax25.from_afsk import AX25FromAFSK
+from ax25.hdlc import get_deframer_table
+from ax25.fixer import get_syndrome_tables
+
+from bench.corpus import random_aprs
+from bench.corpus import modulate
+from bench.corpus import add_noise
+
+def best(fn, n = 5):
+    # (result, least cpu seconds) of n runs
+    dt = None
+    for _ in range(n):
+        t = time.process_time()
+        r = fn()
+        t = time.process_time()-t
+        dt = t if dt is None else min(dt, t)
+    return r, dt
+
+def run(rate, sigmas, nframes = 30):
+    msgs = random_aprs(nframes)
+    clean = modulate(msgs, rate)
+    sent = set(msgs)
+    get_deframer_table()  # tables built on first use, not part of either timing
+    get_syndrome_tables()
+    rows = []
+    for sigma in sigmas:
+        arr = add_noise(clean, sigma, seed = sigma)
+        arr.extend(bytes(2*rate//10)) # flush the filters
+        demod = AFSKDemodulator(in_rx = None, bits_out_q = None, sampling_rate = rate, soft = True)
+        bits, confs = demod.process_block_soft(arr, len(arr))
+
+        def count(frames):
+            return sum(1 for ax25 in frames if ax25 and bytes(ax25.to_aprs()) in sent)
+
+        def bad(frames):
+            return sum(1 for ax25 in frames if ax25 and bytes(ax25.to_aprs()) not in sent)
+
+        def run_hard():
+            hard = AX25FromAFSK(None, None)
+            return [hard.decode_frame(memoryview(frame), fcs) for frame,fcs in HDLCDeframer().feed(bits)]
+
+        def run_soft():
+            soft = AX25FromAFSK(None, None, soft = True)
+            frames = [soft.decode_frame(memoryview(frame) if frame else None, fcs, span)
+                      for frame,fcs,span in SoftHDLCDeframer().feed(bits, confs)]
+            return frames, soft.soft_fixer.counters['fixed']
+
+        hard_frames, t_hard = best(run_hard)
+        (soft_frames, nfix), t_soft = best(run_soft)
+        rows.append((sigma, count(hard_frames), t_hard, bad(hard_frames),
+                     count(soft_frames), t_soft, bad(soft_frames), nfix))
+    return rows
+
+def main():
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 22050
+    sigmas = [int(x) for x in sys.argv[2:]] or [4000, 6000, 8000, 10000]
+    nframes = 30
+    print('rate {} frames sent {}'.format(rate, nframes))
+    print('{:>6} {:>6} {:>10} {:>6} {:>6} {:>10} {:>6} {:>6}'.format('sigma', 'hard', 'hard f/s', 'bad', 'soft', 'soft f/s', 'bad', 'soft+'))
+    for sigma, nh, th, bh, ns, ts, bs, nfix in run(rate, sigmas, nframes):
+        print('{:>6} {:>6} {:>10.0f} {:>6} {:>6} {:>10.0f} {:>6} {:>6}'.format(
+              sigma, nh, nh/max(th,1e-6), bh, ns, ns/max(ts,1e-6), bs, nfix))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import os
+from json import loads
+from json import dumps
+from hashlib import sha256
+from binascii import hexlify
+from collections import OrderedDict
+
+# Filter coefficient cache.  Entries are keyed by a hash of the design name and
+# parameters and stored one json file per entry, written to a temp file of its
+# own and renamed, so concurrent writers (threads, worker processes) never see a
+# partial file.  A small in-process LRU sits in front.  The store ships with the
+# coefficients we deploy (see aprs_coefs.py) so the demodulator never needs scipy
+# on the Pi.
+
+_LRU_SIZE = 32
+
+def _default_dir():
+    d = os.getenv('APRS_COEF_DIR') if hasattr(os, 'getenv') else None
+    if d:
+        return d
+    try:
+        return __file__.rsplit('/', 1)[0] + '/coefs'
+    except NameError:
+        return 'lib/coefs'
+
+_dir = None
+_lru = OrderedDict()
+
+def set_cache_dir(path):
+    global _dir
+    _dir = path
+    _lru.clear()
+
+def get_cache_dir():
+    global _dir
+    if _dir is None:
+        _dir = _default_dir()
+    return _dir
+
+def coef_key(name, *args):
+    # stable across runs and platforms, unlike hash()
+    h = sha256(dumps([name] + list(args)).encode()).digest()
+    return '{}-{}'.format(name, hexlify(h[:8]).decode())
+
+def _path(key):
+    return '{}/{}.json'.format(get_cache_dir(), key)
+
+def coef_loads(name, *args):
+    # returns the cached result or None
+    key = coef_key(name, *args)
+    if key in _lru:
+        res = _lru.pop(key)
+        _lru[key] = res
+        return res
+    try:
+        with open(_path(key), 'r') as f:
+            r = loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if r['name'] != name or r['args'] != list(args):
+        return None
+    res = r['res']
+    _lru_put(key, res)
+    return res
+
+def coef_dumps(name, res, *args):
+    key = coef_key(name, *args)
+    _lru_put(key, res)
+    path = _path(key)
+    try:
+        try:
+            os.mkdir(get_cache_dir())
+        except OSError:
+            pass # exists
+        f, tmp = _tmp_file(path)
+        try:
+            with f:
+                f.write(dumps({
+                    'name' : name,
+                    'args' : list(args),
+                    'res'  : res,
+                }))
+            os.rename(tmp, path)
+        except OSError:
+            os.remove(tmp)
+            raise
+    except OSError:
+        # read-only store, keep it in memory only
+        pass
+
+def _tmp_file(path):
+    # (open file, name) to write path through, a name no other thread or
+    # process uses.  tempfile only on a write, it is slow to import
+    try:
+        from tempfile import mkstemp
+    except ImportError:
+        # micropython, a single writer
+        tmp = path + '.tmp'
+        return open(tmp, 'w'), tmp
+    fd, tmp = mkstemp(suffix = '.tmp', dir = get_cache_dir())
+    return os.fdopen(fd, 'w'), tmp
+
+def coef_cached(name, design, *args):
+    # cached result of design(), design only runs on a miss
+    res = coef_loads(name, *args)
+    if res is None:
+        res = design()
+        coef_dumps(name, res, *args)
+    return res
+
+def _lru_put(key, res):
+    _lru[key] = res
+    while len(_lru) > _LRU_SIZE:
+        del _lru[next(iter(_lru))] # least recently used
@@ -1,7 +1,6 @@
 
 import sys
 import io
-import asyncio
 
 # python or micropython?
 if sys.implementation.name == 'micropython':
@@ -9,6 +8,11 @@ if sys.implementation.name == 'micropython':
 else:
     IS_UPY = False
 
+# python imports asyncio (~50ms) and traceback only when something uses them,
+# the synchronous tools (aprs_demod.py, the benchmarks) never pay for them
+if IS_UPY:
+    import asyncio
+
 if IS_UPY:
     from micropython import const
 else:
@@ -37,9 +41,21 @@ if IS_UPY:
     print_exc = sys.print_exception
 else:
     #python3
-    import traceback
-    # print_exc = traceback.print_exc
-    print_exc = traceback.print_exception
+    def print_exc(*args):
+        import traceback
+        traceback.print_exception(*args)
+
+
+# millisecond ticks, for time budgets
+if IS_UPY:
+    from time import ticks_ms
+    from time import ticks_diff
+else:
+    from time import monotonic
+    def ticks_ms():
+        return int(monotonic()*1000)
+    def ticks_diff(a, b):
+        return a - b
 
 
 # Stdin
@@ -49,6 +65,7 @@ if IS_UPY:
 else:
     #python3
     async def get_stdin_streamreader():
+        import asyncio
         loop = asyncio.get_event_loop()
         reader = asyncio.StreamReader()
         protocol = asyncio.StreamReaderProtocol(reader)
@@ -62,7 +79,12 @@ if IS_UPY:
     import upy.primitives
     Queue = upy.primitives.Queue
 else:
-    #python3
-    Queue = asyncio.Queue
+    #python3, Queue on first use (module __getattr__)
+    def __getattr__(name):
+        if name == 'Queue':
+            import asyncio
+            globals()['Queue'] = asyncio.Queue
+            return asyncio.Queue
+        raise AttributeError(name)
 
 
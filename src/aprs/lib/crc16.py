@@ -93,6 +93,10 @@ CRC16_AX25 = array('H',[
    0x7bc7, 0x6a4e, 0x58d5, 0x495c, 0x3de3, 0x2c6a, 0x1ef1, 0x0f78
 ])
 
+# running the ax25 crc register over a frame AND its fcs leaves this residue
+# (before the final xor) when the frame is good
+CRC16_CCIT_GOOD = 0xf0b8
+
 if IS_UPY and HAS_C:
     # C OPTIMIZED
     from ccrc import crc16_ccit
@@ -1 +0,0 @@
-j={"bpf": [{"args": [1200, 2200, 11025, 45, 400, 2, 3], "res": [[-136, -37, 233, 297, 4, -222, -9, 246, -98, -747, -646, 356, 954, 275, -480, 335, 1826, 1113, -2368, -4851, -2450, 3283, 6330, 3283, -2450, -4851, -2368, 1113, 1826, 335, -480, 275, 954, 356, -646, -747, -98, 246, -9, -222, 4, 297, 233, -37, -136], 16666]}, {"args": [1200, 2200, 22050, 91, 400, 2, 3], "res": [[-54, -72, -62, -18, 50, 119, 158, 148, 88, 1, -75, -106, -75, 4, 89, 127, 80, -54, -231, -379, -424, -324, -98, 178, 397, 470, 364, 129, -118, -239, -139, 178, 598, 922, 948, 557, -220, -1185, -2026, -2421, -2156, -1221, 170, 1634, 2740, 3151, 2740, 1634, 170, -1221, -2156, -2421, -2026, -1185, -220, 557, 948, 922, 598, 178, -139, -239, -118, 129, 364, 470, 397, 178, -98, -324, -424, -379, -231, -54, 80, 127, 89, 4, -75, -106, -75, 1, 88, 148, 158, 119, 50, -18, -62, -72, -54], 9984]}], "lpf": [{"args": [800, 11025, 45, 250, 3], "res": [[-223, -306, -323, -252, -97, 113, 322, 465, 480, 330, 16, -412, -865, -1229, -1389, -1256, -796, -42, 910, 1909, 2788, 3389, 3603, 3389, 2788, 1909, 910, -42, -796, -1256, -1389, -1229, -865, -412, 16, 330, 480, 465, 322, 113, -97, -252, -323, -306, -223], 10667]}, {"args": [800, 22050, 91, 250, 3], "res": [[-86, -114, -137, -154, -162, -161, -148, -124, -89, -45, 5, 59, 113, 163, 204, 233, 245, 239, 211, 162, 93, 5, -98, -209, -324, -435, -534, -615, -670, -693, -679, -625, -530, -394, -222, -17, 212, 457, 708, 955, 1186, 1392, 1563, 1691, 1770, 1797, 1770, 1691, 1563, 1392, 1186, 955, 708, 457, 212, -17, -222, -394, -530, -625, -679, -693, -670, -615, -534, -435, -324, -209, -98, 5, 93, 162, 211, 239, 245, 233, 204, 163, 113, 59, 5, -45, -89, -124, -148, -161, -162, -154, -137, -114, -86], 10599]}]}
\ No newline at end of file
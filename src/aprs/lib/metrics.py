@@ -0,0 +1,119 @@
+import os
+
+from lib.compat import IS_UPY
+from lib.compat import ticks_ms
+from lib.compat import ticks_diff
+
+# Runtime counters for the modem, off unless a Metrics is handed to the
+# components (metrics = Metrics()).  Counters only ever grow, so rates and the
+# real time margin come from the difference of two exports:
+#   stage_seconds_total{stage="bpf"}  cpu time per stage, see STAGES
+#   demod_audio_seconds_total         audio the demodulator was handed
+#   demod_samples_total               samples that went through the filters
+#   demod_squelched_samples_total     ... below the squelch, no discriminator
+#   frames_decoded_total, frames_fixed_total, frames_failed_total
+#   mod_samples_total
+# gauges are sampled when exported, eg. queue_depth{queue="bits"}.  The
+# exporter writes a prometheus text file (node_exporter textfile collector,
+# replaced atomically) or appends json lines
+STAGES = ('bpf', 'pwr', 'disc', 'lpf', 'sampler', 'deframe', 'decode', 'fix', 'mod')
+
+if IS_UPY:
+    from time import ticks_us
+    clock = ticks_us
+    def elapsed(t0):
+        return ticks_diff(ticks_us(), t0)/1e6
+else:
+    from time import perf_counter
+    clock = perf_counter
+    def elapsed(t0):
+        return perf_counter()-t0
+
+def _fmt(name, labels):
+    return '{}{{{}}}'.format(name, labels) if labels else name
+
+class Metrics():
+    def __init__(self, prefix = 'aprs'):
+        self.prefix = prefix
+        self.counters = {} # (name, labels) : value, labels a prometheus label string or None
+        self.gauges = {}   # (name, labels) : fn
+
+    def inc(self, name, n = 1, labels = None):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def time(self, stage, t0):
+        # add the time since t0 (clock()) to a stage
+        key = ('stage_seconds_total', 'stage="' + stage + '"')
+        self.counters[key] = self.counters.get(key, 0) + elapsed(t0)
+
+    def gauge(self, name, fn, labels = None):
+        self.gauges[(name, labels)] = fn
+
+    def queue(self, name, q):
+        # queue depth gauge, for queues that can tell
+        if q is not None and hasattr(q, 'qsize'):
+            self.gauge('queue_depth', q.qsize, 'queue="' + name + '"')
+
+    def snapshot(self):
+        # [(name, labels, value, 'counter' | 'gauge')], names prefixed
+        p = self.prefix + '_' if self.prefix else ''
+        out = [(p+name, labels, v, 'counter') for (name, labels),v in sorted(self.counters.items(), key = lambda kv: (kv[0][0], kv[0][1] or ''))]
+        for (name, labels),fn in self.gauges.items():
+            try:
+                out.append((p+name, labels, fn(), 'gauge'))
+            except Exception:
+                pass
+        return out
+
+    def prometheus(self):
+        lines = []
+        typed = set()
+        for name,labels,v,kind in self.snapshot():
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE {} {}'.format(name, kind))
+            lines.append('{} {}'.format(_fmt(name, labels), v))
+        return '\n'.join(lines) + '\n'
+
+    def json(self, t = None):
+        import json
+        d = {_fmt(name, labels) : v for name,labels,v,_ in self.snapshot()}
+        if t is not None:
+            d['t'] = t
+        return json.dumps(d)
+
+class MetricsExporter():
+    # write metrics to path every interval seconds, prometheus text for *.prom,
+    # json lines otherwise.  poll() from a block loop, or run() as a task
+    def __init__(self, metrics, path, interval = 10):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.prom = path.endswith('.prom')
+        self.last = ticks_ms()
+        self.t0 = ticks_ms()
+
+    def poll(self):
+        if ticks_diff(ticks_ms(), self.last) >= self.interval*1000:
+            self.export()
+
+    def export(self):
+        self.last = ticks_ms()
+        if self.prom:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                f.write(self.metrics.prometheus())
+            os.rename(tmp, self.path)
+        else:
+            with open(self.path, 'a') as f:
+                f.write(self.metrics.json(t = ticks_diff(self.last, self.t0)/1000) + '\n')
+
+    async def run(self):
+        import asyncio
+        while True:
+            await asyncio.sleep(self.interval)
+            self.export()
+
+    def close(self):
+        self.export()
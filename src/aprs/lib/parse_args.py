@@ -1,13 +1,17 @@
 
 import sys
-from json import loads as jsonloads
 
-# get the current year
-try:
-    from datetime import datetime
-    year = datetime.now().year
-except:
-    year = 2025
+def copyright_year():
+    # only the help text wants it, datetime stays out of every start up
+    try:
+        from datetime import datetime
+        return datetime.now().year
+    except:
+        return 2025
+
+def jsonloads(s):
+    from json import loads
+    return loads(s)
 
 def mod_parse_args(args):
     r = {
@@ -28,7 +32,7 @@ def mod_parse_args(args):
 
     if '-h' in args or '--help' in args or '-help' in args:
         print(f'''APRS MOD
-© Stéphane Smith (KI5TOF) {year}
+© Stéphane Smith (KI5TOF) {copyright_year()}
 
 aprs_mod.py parses input AX25 APRS strings and outputs AFSK samples in signed 16 bit little endian format.
 
@@ -89,7 +93,10 @@ def demod_parse_args(args):
             'debug_samples'   : False,
             'quiet'   : False,
             'rate'    : 22050,
+            'channels' : 1,
             'options' : {},
+            'metrics' : None,
+            'metrics_interval' : 10,
         },
         'in' : {
             'type' : 's16',
@@ -103,7 +110,7 @@ def demod_parse_args(args):
 
     if '-h' in args or '--help' in args:
         print(f'''APRS DEMOD
-© Stéphane Smith (KI5TOF) {year}
+© Stéphane Smith (KI5TOF) {copyright_year()}
 
 Usage: 
 aprs_demod.py [options] (-t outfile) (-t infile)
@@ -113,12 +120,19 @@ aprs_demod.py
 
 OPTIONS:
 -r, --rate       22050 (default)
+-c, --channels   1 (default), interleaved channels of raw input, wav files carry their own
+-o               filter options (json), eg. '{{"sampler":"pll"}}'
 -v, --verbose    verbose intermediate output to stderr
+-q, --quiet      no stats on stderr
+--metrics        file, per stage cpu time and frame counters, prometheus text
+                 for *.prom (node_exporter textfile collector), else json lines
+--metrics_interval  10 (default) seconds between metrics exports
 
-DETAIL DEBUG MODE, output samples at specific stages within pipeline. Nominall use this
-option to create wav files at each step and view them in audacity to see what's up.
-Stages: input, bandpass filter, correlator, and lowpass filter.
--d, --debug_samples 'in' | 'bpf' | 'cor' | 'lpf'
+DETAIL DEBUG MODE, record the samples at specific stages within the pipeline to
+<stage>.wav files (<stage>.<channel>.wav multi channel), view them in audacity to
+see what's up.  Stages: input, bandpass filter, power meter, correlator, and
+lowpass filter, comma separated.
+-d, --debug_samples 'in' | 'bpf' | 'pwr' | 'cor' | 'lpf'
 
 -t INPUT TYPE OPTIONS:
 intype       's16' | 'u16'
@@ -141,10 +155,20 @@ outfile       '-' (default stdout)
             r['args']['rate'] = get_arg_val(args, '-r', int)
         if '-v' in args or '--verbose' in args:
             r['args']['verbose'] = True
+        if '-q' in args or '--quiet' in args:
+            r['args']['quiet'] = True
+        if '--channels' in args:
+            r['args']['channels'] = get_arg_val(args, '--channels', int)
+        if '-c' in args:
+            r['args']['channels'] = get_arg_val(args, '-c', int)
         if '--debug_samples' in args:
             r['args']['debug_samples'] = get_arg_val(args, '--debug_samples', str)
         if '-d' in args:
             r['args']['debug_samples'] = get_arg_val(args, '-d', str)
+        if '--metrics' in args:
+            r['args']['metrics'] = get_arg_val(args, '--metrics', str)
+        if '--metrics_interval' in args:
+            r['args']['metrics_interval'] = get_arg_val(args, '--metrics_interval', float)
         if '-o' in args:
             jsonstr = get_arg_val(args, '-o', str)
             jsonstr = jsonstr.replace('\'','')
@@ -162,7 +186,8 @@ outfile       '-' (default stdout)
             pass
     try:
         _in = spl.pop(0)
-        # r['in']['type'] = _in[0]
+        if len(_in) > 1:
+            r['in']['type'] = _in[0]
         r['in']['file'] = _in[-1]
     except IndexError:
         pass
@@ -0,0 +1,117 @@
+import struct
+
+from multiprocessing import shared_memory
+from multiprocessing import Lock
+
+# header, each field has a single writer
+#   head     u64, bytes written, producer only
+#   tail     u64, bytes read, consumer only
+#   overrun  u64, bytes dropped because the ring was full, producer only
+#   closed   u8,  producer is done, producer only
+# the fields are only read and written holding the ring's lock.  Not for
+# mutual exclusion, the data is copied outside of it, but as the memory
+# barrier: on weakly ordered cpus (ARM, the Pi) another core could otherwise
+# see the new head before the data bytes, or the producer reuse space before
+# the consumer's copy out is done.  Lock release/acquire (sem_post/sem_wait)
+# orders everything before it
+_HEAD    = 0
+_TAIL    = 8
+_OVERRUN = 16
+_CLOSED  = 24
+_DATA    = 64
+
+class ShmRing():
+    # Single producer, single consumer byte ring in shared memory.  head and tail
+    # only ever grow, the producer publishes head after the data is copied in and
+    # the consumer publishes tail after it has copied out, so each side only
+    # reads the other's counter.  The producer never waits, if the ring is full
+    # the rest of the write is dropped and counted in overrun.  Attaching needs
+    # the owner's lock, pass ring.lock to the other process with the name
+    def __init__(self, size = 1<<16, # data bytes, power of 2
+                       name = None,  # attach to an existing ring
+                       lock = None,  # the existing ring's lock
+                       ):
+        if name:
+            if lock is None:
+                raise Exception('attaching to a ring needs its lock')
+            self.shm = shared_memory.SharedMemory(name = name)
+            size = self.shm.size - _DATA
+        else:
+            if size & (size-1):
+                raise Exception('ring size must be a power of 2')
+            self.shm = shared_memory.SharedMemory(create = True, size = _DATA+size)
+            self.shm.buf[:_DATA] = bytes(_DATA)
+        self.owner = not name
+        self.lock = lock or Lock()
+        self.name = self.shm.name
+        self.size = size
+        self.mask = size-1
+        self.buf = self.shm.buf
+
+    def _get(self, off):
+        return struct.unpack_from('<Q', self.buf, off)[0]
+
+    def _set(self, off, v):
+        struct.pack_into('<Q', self.buf, off, v)
+
+    def __len__(self):
+        # bytes ready to read
+        with self.lock:
+            return self._get(_HEAD) - self._get(_TAIL)
+
+    @property
+    def overrun(self):
+        with self.lock:
+            return self._get(_OVERRUN)
+
+    @property
+    def closed(self):
+        with self.lock:
+            return self.buf[_CLOSED] != 0
+
+    def write(self, data):
+        # producer, returns the number of bytes written
+        buf = self.buf
+        with self.lock:
+            head = self._get(_HEAD)
+            n = min(len(data), self.size - (head - self._get(_TAIL)))
+            if n < len(data):
+                self._set(_OVERRUN, self._get(_OVERRUN) + len(data) - n)
+        i = head & self.mask
+        k = min(n, self.size - i)
+        buf[_DATA+i:_DATA+i+k] = data[:k]
+        if n > k:
+            buf[_DATA:_DATA+n-k] = data[k:n]
+        with self.lock:
+            self._set(_HEAD, head + n) # publish
+        return n
+
+    def read(self, maxn = None):
+        # consumer, returns up to maxn bytes (b'' when empty)
+        buf = self.buf
+        with self.lock:
+            tail = self._get(_TAIL)
+            n = self._get(_HEAD) - tail
+        if maxn != None:
+            n = min(n, maxn)
+        if not n:
+            return b''
+        i = tail & self.mask
+        k = min(n, self.size - i)
+        out = bytes(buf[_DATA+i:_DATA+i+k])
+        if n > k:
+            out += bytes(buf[_DATA:_DATA+n-k])
+        with self.lock:
+            self._set(_TAIL, tail + n) # publish
+        return out
+
+    def close_write(self):
+        # producer, no more data
+        with self.lock:
+            self.buf[_CLOSED] = 1
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
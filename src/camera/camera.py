@@ -9,6 +9,13 @@ from os.path import isfile, join
 import random
 import time
 import shutil
+import csv
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageFile
+ImageFile.LOAD_TRUNCATED_IMAGES = True  # allow Pillow to load truncated images
 
 state.sim_on=True #COMMENT OUT AFTER DEVELOPMENT!
 
@@ -42,7 +49,150 @@ config_path = os.path.join(script_dir, "recover_index.txt")
 img_path = os.path.join(script_dir, "images")
 fake_img_path = os.path.join(img_path,"fake")
 
-camera_index = int(open(config_path).read().strip())
+index_path = os.path.join(img_path, "index.csv")
+derived_path = os.path.join(img_path, "sstv")
+os.makedirs(derived_path, exist_ok=True)
+
+#SSTV ready copies are made off the capture loop, Pillow releases the GIL
+#while it decodes and resizes
+DERIVED_SIZE = (640, 492)
+#The SSTV selector picks from the latest few captures, copies of older ones
+#are deleted
+SSTV_CANDIDATES = 5
+derive_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="derive")
+
+#One row per capture, GPS fix at capture time
+Capture = namedtuple("Capture", "index path size ts lat lon alt")
+
+class CaptureIndex:
+    #Captures in order, kept in memory and appended to index.csv next to the
+    #images, so picking the latest ones never lists or stats the images
+    #directory.  Written by the camera thread, read by the SSTV encoder
+    def __init__(self, path, image_dir):
+        self.path = path
+        self.image_dir = image_dir
+        self._lock = threading.Lock()
+        self._captures = []
+        if os.path.exists(path):
+            self._load()
+        else:
+            self._rebuild()
+
+    def _load(self):
+        with open(self.path, newline="") as f:
+            for row in csv.reader(f):
+                try:
+                    index, name, size, ts, lat, lon, alt = row
+                    self._captures.append(Capture(int(index), os.path.join(self.image_dir, name), int(size),
+                                                  float(ts), float(lat), float(lon), float(alt)))
+                except ValueError:
+                    camera_logger.warning("Skipping bad capture index row %s", row)  # eg. cut short by a power loss
+        camera_logger.info("Loaded %s captures from %s", len(self._captures), self.path)
+
+    def _rebuild(self):
+        #Once, for image directories from before the index: by mtime, no GPS
+        found = []
+        for name in listdir(self.image_dir):
+            f = join(self.image_dir, name)
+            if isfile(f) and name.endswith(".jpg"):
+                stem = name[:-4]
+                found.append((os.path.getmtime(f), int(stem) if stem.isdigit() else -1, f))
+        found.sort()
+        for ts, index, f in found:
+            self.add(index, f, ts=ts, gps=(0.0, 0.0, 0))
+        camera_logger.info("Rebuilt capture index from %s images", len(found))
+
+    def add(self, index, path, ts=None, gps=None):
+        lat, lon, alt = gps if gps is not None else (state.gps_lat, state.gps_lon, state.gps_alt)
+        capture = Capture(index, path, os.path.getsize(path), time.time() if ts is None else ts, lat, lon, alt)
+        with self._lock:
+            self._captures.append(capture)
+        with open(self.path, "a", newline="") as f:
+            csv.writer(f).writerow([capture.index, os.path.basename(path), capture.size,
+                                    "%.3f" % capture.ts, capture.lat, capture.lon, capture.alt])
+        return capture
+
+    def latest(self, n=1):
+        #The last n captures, newest first
+        with self._lock:
+            return self._captures[:-n - 1:-1]
+
+    def last_index(self):
+        with self._lock:
+            return self._captures[-1].index if self._captures else -1
+
+capture_index = CaptureIndex(index_path, img_path)
+
+def derived_file(capture):
+    return os.path.join(derived_path, f"{capture.index}.png")
+
+def make_derived(capture):
+    #The capture scaled to fit DERIVED_SIZE for the SSTV renderer.  draft()
+    #lets the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding, so
+    #the full resolution image is never decoded
+    out = derived_file(capture)
+    if os.path.exists(out):
+        return out
+    with Image.open(capture.path) as img:
+        img.draft("RGB", DERIVED_SIZE)
+        img = img.convert("RGB")
+    img.thumbnail(DERIVED_SIZE, Image.Resampling.LANCZOS)
+    #a temp file of our own, two threads making the same copy never share one
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=derived_path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, format="png", compress_level=1)
+        os.replace(tmp, out)  # never seen half written
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return out
+
+def prune_derived():
+    #Delete the copies of captures the selector can no longer pick.  Twice the
+    #candidates are kept, so a copy picked just before the next capture is
+    #still there when the renderer opens it
+    keep = {os.path.basename(derived_file(c)) for c in capture_index.latest(2 * SSTV_CANDIDATES)}
+    for name in listdir(derived_path):
+        if name.endswith(".png") and name not in keep:
+            try:
+                os.remove(join(derived_path, name))
+            except FileNotFoundError:
+                pass  # the other worker got it first
+
+def _derive(capture):
+    try:
+        make_derived(capture)
+        prune_derived()
+    except Exception:
+        camera_logger.exception("Could not make the SSTV copy of %s", capture.path)
+
+#copies still being made by the pool, capture index : Future
+_pending = {}
+_pending_lock = threading.Lock()
+
+def _forget(index, future):
+    with _pending_lock:
+        if _pending.get(index) is future:
+            del _pending[index]
+
+def submit_derived(capture):
+    with _pending_lock:
+        future = derive_pool.submit(_derive, capture)
+        _pending[capture.index] = future
+    future.add_done_callback(lambda f: _forget(capture.index, f))
+
+def derived(capture):
+    #The SSTV copy of a capture: waits for the pool if it is on it, makes it
+    #here if the pool never got it (eg. captures from before a restart)
+    with _pending_lock:
+        future = _pending.get(capture.index)
+    if future is not None:
+        future.result()
+    return make_derived(capture)
+
+#recover_index.txt is empty on a fresh card, carry on from the index then
+camera_index = int(open(config_path).read().strip() or capture_index.last_index() + 1)
 camera_logger.info("Camera index is %s",camera_index)
 
 def update_index(new_value):
@@ -54,6 +204,7 @@ def mainloop():
     global camera_index
     while True:
         # Take an image, save it, then wait
+        dest_file = os.path.join(img_path, f"{camera_index}.jpg")
         if use_camera_driver:
             # cam.take_photo()
             x = 1  # Placeholder for real camera code
@@ -70,11 +221,14 @@ def mainloop():
 
             # Correct path handling
             fake_img_path_file = os.path.join(fake_img_path, image)
-            dest_file = os.path.join(img_path, f"{camera_index}.jpg")
 
             # Copy the file
             shutil.copy(fake_img_path_file, dest_file)
-        
+
+        #index the capture once it is complete on disk
+        if os.path.exists(dest_file):
+            submit_derived(capture_index.add(camera_index, dest_file))
+
         #advance index
 
         camera_index += 1
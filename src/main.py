@@ -74,6 +74,10 @@ logging.info(
     state.gps_lat, state.gps_lon, state.gps_sats, state.gps_alt
 )
 state.changeState(state.IDLE)
+#Encode SSTV images in the background from now on, the next one is
+#ready by the time the APRS packets are out
+logging.info("Starting SSTV encoder...")
+sstv_pipeline = sstv.Pipeline().start()
 # start the main loop!
 while True:
     for i in range(state.aprs_packets):
@@ -81,6 +85,6 @@ while True:
         logging.info("Sending APRS packet...")
         aprs.sendAPRS()
         time.sleep(state.aprs_period)
-    #send SSTV
-    sstv.run_encoding()
-    sstv.send_sstv()
\ No newline at end of file
+    #send SSTV, if no encoding is ready within one APRS period skip it this
+    #cycle rather than hold up the beacons
+    sstv_pipeline.send(timeout=state.aprs_period)
\ No newline at end of file
@@ -0,0 +1,75 @@
+#Encode time per image for the SSTV encoder
+#   cd src && python -m sstv.bench_encode [image] [--mode PD120] [--rate 18000] [-n 5] [--pysstv] [--wav out.wav]
+#Prints the best and median encode time, the audio length and the real time
+#factor (encode time per second of audio).  --pysstv also times
+#"python -m pysstv" on the same image for comparison, one run
+import sys
+import time
+import subprocess
+import tempfile
+from pathlib import Path
+from statistics import median
+
+from PIL import Image
+
+from sstv.encoder import MODES, encode, write_wav
+
+script_dir = Path(__file__).resolve().parent
+
+
+def arg(args, flag, fn=str, default=None):
+    if flag in args:
+        return fn(args[args.index(flag) + 1])
+    return default
+
+
+def test_image(path, mode):
+    #The given image, else the newest capture, else a colour gradient
+    if path:
+        return Image.open(path)
+    images = sorted((script_dir.parent / "camera" / "images").glob("*.jpg"))
+    if images:
+        return Image.open(images[-1])
+    x = [(255 * i // mode.width, 255 * j // mode.height, 128) for j in range(mode.height) for i in range(mode.width)]
+    img = Image.new("RGB", (mode.width, mode.height))
+    img.putdata(x)
+    return img
+
+
+def main(args):
+    mode_name = arg(args, "--mode", str, "PD120")
+    mode = MODES[mode_name]
+    rate = arg(args, "--rate", int, 18000)
+    n = arg(args, "-n", int, 5)
+    path = args[0] if args and not args[0].startswith("-") else None
+
+    img = test_image(path, mode).convert("RGB")
+    img.thumbnail((mode.width, mode.height))
+    times = []
+    for _ in range(n):
+        t = time.perf_counter()
+        samples = encode(img, mode, rate)
+        times.append(time.perf_counter() - t)
+    audio = len(samples) / rate
+    print("{} {} Hz, {:.1f} s of audio".format(mode_name, rate, audio))
+    print("encode best {:.3f} s  median {:.3f} s  rtf {:.4f}".format(min(times), median(times), min(times) / audio))
+
+    wav = arg(args, "--wav")
+    if wav:
+        write_wav(wav, samples, rate)
+
+    if "--pysstv" in args:
+        with tempfile.TemporaryDirectory() as d:
+            png = Path(d) / "in.png"
+            frame = Image.new("RGB", (mode.width, mode.height), "black")
+            frame.paste(img, (0, 0))
+            frame.save(png)
+            t = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "pysstv", "--mode", mode_name, "--rate", str(rate), "--vox",
+                            str(png), str(Path(d) / "out.wav")], check=True)
+            dt = time.perf_counter() - t
+        print("pysstv      {:.3f} s  rtf {:.4f}  ({:.0f}x slower)".format(dt, dt / audio, dt / min(times)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,157 @@
+#In-process SSTV encoder, replaces shelling out to "python -m pysstv".
+#Each scan line is turned into a list of (frequency, duration) segments and
+#synthesized in one go with numpy: every sample gets the frequency of the
+#segment it falls in and the phase is the running sum of those frequencies,
+#so the tone is phase continuous across segments and lines, like pysstv's
+#sample by sample generator, without a python loop per sample.
+import wave
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+#Frequencies in Hz, durations in ms
+FREQ_VIS_BIT1 = 1100
+FREQ_SYNC = 1200
+FREQ_VIS_BIT0 = 1300
+FREQ_BLACK = 1500
+FREQ_VIS_START = 1900
+FREQ_RANGE = 800  # black to white
+MSEC_VIS_START = 300
+MSEC_VIS_SYNC = 10
+MSEC_VIS_BIT = 30
+
+VOX_TONES = (1900, 1500, 1900, 1500, 2300, 1500, 2300, 1500)
+MSEC_VOX = 100
+
+#The PD modes send two image rows per scan line: Y of the first row, the
+#averaged R-Y and B-Y of both rows, then Y of the second row
+PD = namedtuple("PD", "vis width height sync porch pixel")
+
+MODES = {
+    "PD90": PD(vis=0x63, width=320, height=256, sync=20, porch=2.08, pixel=0.532),
+    "PD120": PD(vis=0x5f, width=640, height=496, sync=20, porch=2.08, pixel=0.19),
+    "PD160": PD(vis=0x62, width=512, height=400, sync=20, porch=2.08, pixel=0.382),
+    "PD180": PD(vis=0x60, width=640, height=496, sync=20, porch=2.08, pixel=0.286),
+    "PD240": PD(vis=0x61, width=640, height=496, sync=20, porch=2.08, pixel=0.382),
+}
+
+
+def header_segments(vis, vox=True):
+    #Optional vox tones, then the VIS code: 7 bits LSB first and even parity
+    segs = [(f, MSEC_VOX) for f in VOX_TONES] if vox else []
+    segs += [
+        (FREQ_VIS_START, MSEC_VIS_START),
+        (FREQ_SYNC, MSEC_VIS_SYNC),
+        (FREQ_VIS_START, MSEC_VIS_START),
+        (FREQ_SYNC, MSEC_VIS_BIT),  # start bit
+    ]
+    ones = 0
+    for i in range(7):
+        bit = (vis >> i) & 1
+        ones += bit
+        segs.append((FREQ_VIS_BIT1 if bit else FREQ_VIS_BIT0, MSEC_VIS_BIT))
+    segs.append((FREQ_VIS_BIT1 if ones % 2 else FREQ_VIS_BIT0, MSEC_VIS_BIT))  # parity
+    segs.append((FREQ_SYNC, MSEC_VIS_BIT))  # stop bit
+    return segs
+
+
+def fit(image, mode):
+    #The image as the mode's YCbCr frame.  Larger images are cropped from the
+    #top left, smaller ones padded with black
+    size = (mode.width, mode.height)
+    image = image.convert("RGB")
+    if image.size != size:
+        from PIL import Image
+        frame = Image.new("RGB", size, "black")
+        frame.paste(image, (0, 0))
+        image = frame
+    return np.asarray(image.convert("YCbCr"), dtype=np.float64)
+
+
+def num_samples(mode, rate, vox=True):
+    #Length of the encoding in samples
+    msec = sum(ms for _, ms in header_segments(mode.vis, vox))
+    msec += mode.height // 2 * (mode.sync + mode.porch + 4 * mode.width * mode.pixel)
+    return int(msec * rate / 1000) + 1
+
+
+class _Synth:
+    #Phase continuous tone segments into an int16 buffer.  pos is the exact
+    #(fractional) sample position the next segment starts at, segments end on
+    #the sample floor(pos) like pysstv
+    def __init__(self, out, rate, ampli):
+        self.out = out
+        self.rate = rate
+        self.ampli = ampli
+        self.spms = rate / 1000
+        self.pos = 0.0
+        self.n = 0
+        self.phase = 0.0
+
+    def segments(self, freqs, msecs):
+        freqs = np.asarray(freqs, dtype=np.float64)
+        ends = self.pos + np.cumsum(np.asarray(msecs, dtype=np.float64) * self.spms)
+        self.pos = float(ends[-1])
+        counts = np.diff(np.floor(ends + 1e-6), prepend=self.n).astype(np.intp)  # 1e-6, exact boundaries despite rounding
+        inc = np.repeat(freqs * (2 * np.pi / self.rate), counts)
+        if not len(inc):
+            return
+        phase = np.cumsum(inc)
+        phase += self.phase - inc  # phase at the start of each sample
+        n = self.n + len(inc)
+        self.out[self.n:n] = np.rint(np.sin(phase) * self.ampli)
+        self.phase = float(phase[-1] + inc[-1]) % (2 * np.pi)
+        self.n = n
+
+
+def encode(image, mode="PD120", rate=18000, vox=True, ampli=0x7fff, out=None):
+    #PIL image to signed 16 bit samples, array('h').  out, an array('h') to
+    #reuse from an earlier encoding, is resized and overwritten
+    if isinstance(mode, str):
+        mode = MODES[mode]
+    yuv = fit(image, mode)
+    size = num_samples(mode, rate, vox)
+    if out is None:
+        out = array("h", bytes(2 * size))
+    elif len(out) < size:
+        out.frombytes(bytes(2 * (size - len(out))))
+    buf = np.frombuffer(out, dtype=np.int16)
+    synth = _Synth(buf, rate, ampli)
+
+    head = header_segments(mode.vis, vox)
+    synth.segments([f for f, _ in head], [ms for _, ms in head])
+
+    #One scan line: sync, porch and four runs of width pixels
+    w = mode.width
+    msecs = np.full(2 + 4 * w, mode.pixel)
+    msecs[0] = mode.sync
+    msecs[1] = mode.porch
+    freqs = np.empty(2 + 4 * w)
+    freqs[0] = FREQ_SYNC
+    freqs[1] = FREQ_BLACK
+    scale = FREQ_RANGE / 255
+    for line in range(0, mode.height, 2):
+        row0 = yuv[line]
+        row1 = yuv[line + 1]
+        freqs[2:2 + w] = row0[:, 0]
+        freqs[2 + w:2 + 2 * w] = (row0[:, 2] + row1[:, 2]) / 2
+        freqs[2 + 2 * w:2 + 3 * w] = (row0[:, 1] + row1[:, 1]) / 2
+        freqs[2 + 3 * w:] = row1[:, 0]
+        freqs[2:] *= scale
+        freqs[2:] += FREQ_BLACK
+        synth.segments(freqs, msecs)
+
+    n = synth.n
+    del synth, buf  # release the buffer so the array can be trimmed
+    del out[n:]
+    return out
+
+
+def write_wav(path, samples, rate=18000):
+    #Mono 16 bit wav of array('h') samples
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
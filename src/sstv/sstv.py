@@ -1,12 +1,14 @@
 import logging
-import os
 import subprocess
 from pathlib import Path
 import state
-import shutil
 from PIL import Image, ImageDraw, ImageFont, ImageFile
 ImageFile.LOAD_TRUNCATED_IMAGES = True  # allow Pillow to load truncated images
 import time
+import threading
+import functools
+from sstv import encoder
+from camera import camera
 
 
 sstv_logger = logging.getLogger("sstv")
@@ -21,91 +23,162 @@ if not sstv_logger.handlers:  # avoid duplicates if imported again
 
 sstv_logger.info("SSTV log initialized")
 
+SSTV_MODE = "PD120"
+SSTV_RATE = 18000
 
-def run_encoding():
+
+@functools.lru_cache(maxsize=None)
+def font(size):
+    return ImageFont.truetype(str(Path(__file__).resolve().parent / "montserrat.ttf"), size)
+
+@functools.lru_cache(maxsize=4)
+def banner(w, h, callsign):
+    # Black canvas for a w x h image with a bar on top for the text (callsign,
+    # HAB), the GPS line is drawn on a copy per image. Do not draw on this one
+    bar_height = int(h * 0.12)  # keep some room
+    canvas = Image.new("RGB", (w, h + bar_height), "black")
+    ImageDraw.Draw(canvas).text(
+        (15,0),
+        f"{callsign} HIGH ALTITUDE BALLOON",
+        fill="white",
+        font=font(28)
+    )
+    return canvas
+
+
+def annotate_latest():
+    # Pick the latest capture and overlay it, returns (image, annotated path) or None
     # Paths
     script_dir = Path(__file__).resolve().parent
-    image_dir = script_dir.parent / "camera" / "images"
     sstv_dir = script_dir / "images"
     sstv_dir.mkdir(parents=True, exist_ok=True)
 
-    # Get all images sorted by modification time (newest first)
-    images = sorted(image_dir.glob("*.*"), key=os.path.getmtime, reverse=True)
-    if not images:
-        sstv_logger.warning("No images found in %s", image_dir)
-        return
-
-    # Take the last 5 chronologically
-    last_five = images[:5]
+    # The last 5 captures from the camera's index, newest first
+    last_five = camera.capture_index.latest(camera.SSTV_CANDIDATES)
+    if not last_five:
+        sstv_logger.warning("No captures in %s", camera.capture_index.path)
+        return None
 
-    # Pick the largest one
-    target_img = max(last_five, key=lambda f: f.stat().st_size)
+    # Pick the largest one, sizes are recorded at capture
+    capture = max(last_five, key=lambda c: c.size)
+    target_img = Path(capture.path)
     sstv_logger.info("Selected image: %s", target_img.name)
 
-        # Copy to sstv/images
-    copied_img = sstv_dir / target_img.name
-    shutil.copy(target_img, copied_img)
-    sstv_logger.debug("Copied image to %s", copied_img)
-
-    # Load image
-    img = Image.open(copied_img).convert("RGB")
-    #resize to 640x496 for PD120
-    img.thumbnail((640,492),Image.Resampling.LANCZOS)
+    # The 640x492 copy made at capture time, or make it now if it is not done yet
+    img = Image.open(camera.derived(capture))
     w, h = img.size
 
-    # Add black bar at top
-    bar_height = int(h * 0.12)  # keep some room
-    new_img = Image.new("RGB", (w, h + bar_height), "black")
-    new_img.paste(img, (0, bar_height))  # shift original image down
-
-    # Overlay text (callsign, HAB, GPS)
-    text = f"{state.callsign} HIGH ALTITUDE BALLOON"
-    text2 = f"LAT:{state.gps_lat} LON:{state.gps_lon}"
-    draw = ImageDraw.Draw(new_img)
-    #print(script_dir)
-    font_small = ImageFont.truetype(str(script_dir)+"/montserrat.ttf", 25)
-    font_large = ImageFont.truetype(str(script_dir)+"/montserrat.ttf",28)
-
-    draw.text(
-        (15,0),
-        text,
-        fill="white",
-        font=font_large
-    )
-    draw.text(
+    # Static banner with the image below it, then the GPS line
+    new_img = banner(w, h, state.callsign).copy()
+    new_img.paste(img, (0, int(h * 0.12)))  # shift original image down
+    img.close()
+    text = f"LAT:{state.gps_lat} LON:{state.gps_lon}"
+    ImageDraw.Draw(new_img).text(
         (15,33),
-        text2,
+        text,
         fill="white",
-        font=font_small
+        font=font(25)
     )
     
     sstv_logger.debug("Annotated image with overlay: %s", text)
 
     # Save annotated image
     annotated_img = sstv_dir / f"annotated_{target_img.stem}.png"
-    new_img.save(annotated_img, format="png")
-    new_img.close()
+    new_img.save(annotated_img, format="png", compress_level=1)
     sstv_logger.info("Saved annotated image to %s", annotated_img)
+    return new_img, annotated_img
+
+def encode_latest(out=None):
+    # Annotate and encode the latest capture, samples or None. out is a
+    # buffer to reuse, see encoder.encode
+    annotated = annotate_latest()
+    if annotated is None:
+        return None
+    new_img, annotated_img = annotated
+    t = time.perf_counter()
+    samples = encoder.encode(new_img, SSTV_MODE, SSTV_RATE, vox=True, out=out)
+    new_img.close()
+    sstv_logger.info("Encoded %s as %s in %.2fs", annotated_img.name, SSTV_MODE, time.perf_counter() - t)
+    return samples
 
-    time.sleep(0.5)
-    # Output WAV in script directory
-    output_wav = script_dir / "output.wav"
-
-    # Run pysstv in the background
-    cmd = [
-        "python", "-m", "pysstv",
-        "--mode", "PD120",
-        "--rate", "18000",
-        "--vox",
-        str(annotated_img),
-        str(output_wav)
-    ]
-
-    subprocess.Popen(cmd, cwd=script_dir)
-    sstv_logger.info("Running pysstv on %s, saving to %s", annotated_img.name, output_wav.name)
+def run_encoding():
+    # Encode the latest capture to output.wav next to this script
+    samples = encode_latest()
+    if samples is not None:
+        encoder.write_wav(Path(__file__).resolve().parent / "output.wav", samples, SSTV_RATE)
 
 def send_sstv():
 
     subprocess.run(["aplay",str(Path(__file__).resolve().parent)+"/output.wav"])
 
+def play(samples):
+    # Play samples straight from memory
+    subprocess.run(
+        ["aplay", "-q", "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(SSTV_RATE), "-"],
+        input=memoryview(samples).cast("B"),
+    )
+
+
+class Pipeline:
+    # Encodes the next SSTV image in a background thread while APRS beacons and
+    # the current SSTV transmission go out. There are two sample buffers: the
+    # worker only writes the back one and swaps it to the front under the lock
+    # once it is complete, send() plays the front one. Playback starts at once
+    # and never sees a half written encoding. The overlay GPS is from when the
+    # image was encoded, one cycle before it is sent
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffers = [None, None]
+        self._front = 0              # index of the buffer send() plays
+        self.ready = threading.Event()  # the front buffer holds an unsent encoding
+        self._wanted = threading.Event()
+        self._wanted.set()
+        self._thread = threading.Thread(target=self._worker, name="sstv-encoder", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _worker(self):
+        while True:
+            self._wanted.wait()
+            self._wanted.clear()
+            back = 1 - self._front
+            try:
+                samples = encode_latest(out=self._buffers[back])
+            except Exception:
+                sstv_logger.exception("SSTV pre-encoding failed")
+                samples = None
+            if samples is None:
+                # nothing to encode yet, try again after the next capture
+                time.sleep(state.camera_period)
+                self._wanted.set()
+                continue
+            with self._lock:
+                self._buffers[back] = samples
+                self._front = back
+            self.ready.set()
+
+    def take(self, timeout=None):
+        # The front buffer for playing, None on timeout. Starts encoding the next
+        # image into the other buffer
+        if not self.ready.wait(timeout):
+            return None
+        with self._lock:
+            samples = self._buffers[self._front]
+            self.ready.clear()
+        self._wanted.set()
+        return samples
+
+    def send(self, timeout):
+        # Play the next encoding, waiting at most timeout seconds for it. False
+        # if there was none, the caller carries on without SSTV this cycle
+        samples = self.take(timeout)
+        if samples is None:
+            sstv_logger.warning("No SSTV encoding ready after %.1fs, skipping", timeout)
+            return False
+        sstv_logger.info("Sending SSTV, %.1fs of audio", len(samples) / SSTV_RATE)
+        play(samples)
+        return True
+
 #run_encoding()
\ No newline at end of file